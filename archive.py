@@ -0,0 +1,142 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from config import STORAGE_DIR, log
+
+ARCHIVE_DB = os.path.join(STORAGE_DIR, "archive.sqlite3")
+MAX_RESULTS = 200
+
+MONTHS = (
+    "январь", "февраль", "март", "апрель", "май", "июнь",
+    "июль", "август", "сентябрь", "октябрь", "ноябрь", "декабрь",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    profile TEXT NOT NULL,
+    source_path TEXT,
+    output_path TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5 (
+    profile, body, paths, created,
+    tokenize = "unicode61 remove_diacritics 2"
+);
+"""
+
+
+def _date_words(created: float) -> str:
+    # «2024-03-15 15.03.2024 март 2024» — чтобы находилось «март 2024»
+    t = time.localtime(created)
+    return f"{time.strftime('%Y-%m-%d %d.%m.%Y', t)} {MONTHS[t.tm_mon - 1]} {t.tm_year}"
+
+
+def _body(data: dict) -> str:
+    return "\n".join(str(v) for v in data.values() if isinstance(v, str) and v)
+
+
+def _match_query(text: str) -> str | None:
+    # каждое слово — префикс, все слова обязательны; спецсимволы FTS5
+    # не пропускаются, поэтому ошибки синтаксиса запроса быть не может
+    words = []
+    for word in text.split():
+        word = "".join(ch if ch.isalnum() else " " for ch in word)
+        words.extend(word.split())
+    if not words:
+        return None
+    return " ".join(f'"{w}"*' for w in words)
+
+
+class ArchivedReport:
+    __slots__ = ("id", "created", "profile", "source_path", "output_path", "data")
+
+    def __init__(self, id, created, profile, source_path, output_path, data):
+        self.id = id
+        self.created = created
+        self.profile = profile
+        self.source_path = source_path
+        self.output_path = output_path
+        self.data = json.loads(data)
+
+
+# Архив сохранённых отчётов: шаблон, значения полей, исходный документ и
+# путь к файлу отчёта. Значения, пути и дата (в том числе названием
+# месяца) проиндексированы FTS5, поиск идёт по началу слов.
+class ReportArchive:
+    def __init__(self, path: str = ARCHIVE_DB):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def record(self, profile: str, data: dict, source_path: str | None, output_path: str):
+        self.record_many(profile, [(data, output_path)], source_path)
+
+    def record_many(self, profile: str, reports: list[tuple[dict, str]], source_path: str | None):
+        # отчёты пакетной генерации — одной транзакцией; источник у них общий
+        created = time.time()
+        date_words = _date_words(created)
+        with self._lock:
+            try:
+                with self._db:
+                    for data, output_path in reports:
+                        cur = self._db.execute(
+                            "INSERT INTO reports (created, profile, source_path, output_path, data) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            (created, profile, source_path, output_path, json.dumps(data, ensure_ascii=False)),
+                        )
+                        paths = " ".join(p for p in (source_path, output_path) if p)
+                        self._db.execute(
+                            "INSERT INTO reports_fts (rowid, profile, body, paths, created) VALUES (?, ?, ?, ?, ?)",
+                            (cur.lastrowid, profile, _body(data), paths, date_words),
+                        )
+            except sqlite3.Error:
+                # архив — не повод ронять сохранение отчёта
+                log.exception("Не удалось записать отчёты в архив")
+
+    def search(self, text: str, profile: str | None = None, limit: int = MAX_RESULTS) -> list[ArchivedReport]:
+        # свежие отчёты первыми; пустой запрос — просто последние.
+        # id растёт вместе с датой, а по rowid FTS5 отдаёт совпадения уже
+        # упорядоченными — частое слово не заставляет сортировать весь архив
+        match = _match_query(text)
+        columns = "r.id, r.created, r.profile, r.source_path, r.output_path, r.data"
+        where = []
+        params = []
+        if match is not None:
+            sql = f"SELECT {columns} FROM reports_fts f JOIN reports r ON r.id = f.rowid"
+            where.append("reports_fts MATCH ?")
+            params.append(match)
+            order = "f.rowid"
+        else:
+            sql = f"SELECT {columns} FROM reports r"
+            order = "r.id"
+        if profile is not None:
+            where.append("r.profile = ?")
+            params.append(profile)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            try:
+                return [ArchivedReport(*row) for row in self._db.execute(sql, params)]
+            except sqlite3.Error:
+                log.exception("Ошибка поиска по архиву отчётов")
+                return []
+
+    def profiles(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT DISTINCT profile FROM reports ORDER BY profile")]
+
+    def delete(self, report_id: int):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM reports WHERE id = ?", (report_id,))
+            self._db.execute("DELETE FROM reports_fts WHERE rowid = ?", (report_id,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
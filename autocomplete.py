@@ -0,0 +1,163 @@
+import tkinter as tk
+
+# тег привязок для полей с подсказками из истории значений
+SUGGEST_TAG = "DocFormSuggest"
+MAX_SUGGESTIONS = 8
+# столько мс после потери фокуса ждём щелчка по списку
+HIDE_DELAY_MS = 200
+# подсказки ищутся, когда ввод замер на столько мс
+SUGGEST_DELAY_MS = 120
+
+_QUIET_KEYS = {
+    "Up", "Down", "Left", "Right", "Return", "KP_Enter", "Escape", "Tab", "Home", "End",
+    "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R", "Caps_Lock",
+}
+
+
+# Выпадающий список подсказок под полем ввода. Один на всё приложение:
+# поля подключаются тегом привязок, имя поля для истории берётся из
+# функции, сохранённой в самом виджете (поле могут переименовать).
+# Стрелки выбирают подсказку, Enter подставляет, Escape закрывает,
+# Shift+Delete удаляет выбранное значение из истории.
+class SuggestionPopup:
+    def __init__(self, root: tk.Misc, history):
+        self.root = root
+        self.history = history
+        self.entry = None
+        self._hide_after_id = None
+        self._refresh_after_id = None
+
+        self.top = tk.Toplevel(root)
+        self.top.withdraw()
+        self.top.overrideredirect(True)
+        self.listbox = tk.Listbox(self.top, height=MAX_SUGGESTIONS, takefocus=0, activestyle="none")
+        self.listbox.pack(fill="both", expand=True)
+        self.listbox.bind("<ButtonRelease-1>", self._on_click)
+
+        root.bind_class(SUGGEST_TAG, "<KeyRelease>", self._on_key_release)
+        root.bind_class(SUGGEST_TAG, "<Down>", lambda e: self._move(e, 1))
+        root.bind_class(SUGGEST_TAG, "<Up>", lambda e: self._move(e, -1))
+        root.bind_class(SUGGEST_TAG, "<Return>", self._on_return)
+        root.bind_class(SUGGEST_TAG, "<KP_Enter>", self._on_return)
+        root.bind_class(SUGGEST_TAG, "<Escape>", self._on_escape)
+        root.bind_class(SUGGEST_TAG, "<Shift-Delete>", self._on_forget)
+        root.bind_class(SUGGEST_TAG, "<FocusOut>", self._on_focus_out)
+
+    def attach(self, widget: tk.Entry, field_name):
+        # field_name() — текущее имя поля
+        widget.suggest_field = field_name
+        widget.bindtags((SUGGEST_TAG,) + widget.bindtags())
+
+    @property
+    def shown(self) -> bool:
+        return self.top.winfo_ismapped()
+
+    def _refresh(self, entry):
+        text = entry.get()
+        values = self.history.suggest(entry.suggest_field(), text, MAX_SUGGESTIONS)
+        # единственная подсказка, совпадающая с введённым, не нужна
+        values = [v for v in values if v != text]
+        if not values:
+            self.hide()
+            return
+        self.entry = entry
+        self.listbox.delete(0, tk.END)
+        self.listbox.insert(tk.END, *values)
+        self.listbox.config(height=len(values))
+        self._place(entry)
+
+    def _place(self, entry):
+        x = entry.winfo_rootx()
+        y = entry.winfo_rooty() + entry.winfo_height()
+        self.top.geometry(f"{entry.winfo_width()}x{self.listbox.winfo_reqheight()}+{x}+{y}")
+        self.top.deiconify()
+        self.top.lift()
+
+    def hide(self):
+        self._cancel_refresh()
+        if self._hide_after_id is not None:
+            self.root.after_cancel(self._hide_after_id)
+            self._hide_after_id = None
+        self.top.withdraw()
+        self.entry = None
+
+    def _accept(self, index):
+        entry = self.entry
+        if entry is None:
+            return
+        value = self.listbox.get(index)
+        self.hide()
+        entry.delete(0, tk.END)
+        entry.insert(0, value)
+        entry.icursor(tk.END)
+        entry.focus_set()
+
+    def _on_key_release(self, event):
+        if event.keysym in _QUIET_KEYS:
+            return
+        self._cancel_refresh()
+        self._refresh_after_id = self.root.after(SUGGEST_DELAY_MS, self._delayed_refresh, event.widget)
+
+    def _delayed_refresh(self, entry):
+        self._refresh_after_id = None
+        if entry.winfo_exists() and self.root.focus_get() is entry:
+            self._refresh(entry)
+
+    def _cancel_refresh(self):
+        if self._refresh_after_id is not None:
+            self.root.after_cancel(self._refresh_after_id)
+            self._refresh_after_id = None
+
+    def _move(self, event, step):
+        if not self.shown or self.entry is not event.widget:
+            if step > 0:
+                # стрелка вниз открывает список и без ввода
+                self._cancel_refresh()
+                self._refresh(event.widget)
+                return "break" if self.shown else None
+            return None
+        size = self.listbox.size()
+        current = self.listbox.curselection()
+        index = (current[0] + step) % size if current else (0 if step > 0 else size - 1)
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(index)
+        self.listbox.see(index)
+        return "break"
+
+    def _on_return(self, event):
+        if not self.shown:
+            return None
+        current = self.listbox.curselection()
+        if not current:
+            self.hide()
+            return None
+        self._accept(current[0])
+        return "break"
+
+    def _on_escape(self, event):
+        if not self.shown:
+            return None
+        self.hide()
+        return "break"
+
+    def _on_forget(self, event):
+        current = self.listbox.curselection()
+        if not self.shown or not current:
+            return None
+        self.history.forget(event.widget.suggest_field(), self.listbox.get(current[0]))
+        self._refresh(event.widget)
+        return "break"
+
+    def _on_click(self, event):
+        index = self.listbox.nearest(event.y)
+        if index >= 0:
+            self._accept(index)
+
+    def _on_focus_out(self, event):
+        if self.shown and self._hide_after_id is None:
+            self._hide_after_id = self.root.after(HIDE_DELAY_MS, self._hide_if_unfocused)
+
+    def _hide_if_unfocused(self):
+        self._hide_after_id = None
+        if self.entry is not None and self.root.focus_get() is not self.entry:
+            self.hide()
@@ -0,0 +1,227 @@
+import csv
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from config import SETTINGS
+from readers import ExcelWorkbook, cell_text
+from render import (
+    CompiledTemplate,
+    build_placeholders,
+    build_plain_report,
+    coerce_values,
+    default_report_name,
+)
+
+
+class BatchResult:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = []
+        self.failed = []
+        # (значения строки, путь) для каждого созданного отчёта — для архива
+        self.reports = []
+        self.seconds = 0.0
+        # время конвертации каждого отчёта в PDF, секунды
+        self.convert_seconds = []
+
+    @property
+    def throughput(self) -> float:
+        return len(self.done) / self.seconds if self.seconds else 0.0
+
+    @property
+    def mean_convert_seconds(self) -> float:
+        if not self.convert_seconds:
+            return 0.0
+        return sum(self.convert_seconds) / len(self.convert_seconds)
+
+
+def read_rows(path: str) -> list[dict]:
+    # первая строка — заголовки, совпадающие с внутренними именами полей
+    if path.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            sample = f.read(64 * 1024)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = csv.excel
+            # пустые строки («;;») пропускаются, как и в Excel
+            rows = [
+                row for row in csv.DictReader(f, dialect=dialect)
+                if any(v not in (None, "") for k, v in row.items() if k is not None)
+            ]
+    else:
+        book = ExcelWorkbook(path)
+        try:
+            raw_rows = book.iter_rows()
+            header = [str(v).strip() if v is not None else "" for v in next(raw_rows, ())]
+            rows = []
+            for values in raw_rows:
+                if not any(v not in (None, "") for v in values):
+                    continue
+                rows.append({
+                    name: cell_text(value)
+                    for name, value in zip(header, values)
+                    if name
+                })
+        finally:
+            book.close()
+
+    return [
+        {str(k).strip().upper(): v for k, v in row.items() if k is not None}
+        for row in rows
+    ]
+
+
+def plan_outputs(
+    fields: list[dict], rows: list[dict], out_dir: str, ext: str = ".docx"
+) -> list[tuple[dict, str]]:
+    tasks = []
+    used = set()
+    for row in rows:
+        data = coerce_values(fields, row)
+        base = os.path.splitext(default_report_name(fields, data))[0]
+        name = f"{base}{ext}"
+        n = 2
+        while name.lower() in used or os.path.exists(os.path.join(out_dir, name)):
+            name = f"{base}_{n}{ext}"
+            n += 1
+        used.add(name.lower())
+        tasks.append((data, os.path.join(out_dir, name)))
+    return tasks
+
+
+# Состояние процесса-воркера: шаблон разбирается один раз на процесс,
+# а не на каждую строку
+_worker_fields = None
+_worker_template = None
+
+
+def _init_worker(fields: list[dict], template_abs: str | None):
+    global _worker_fields, _worker_template
+    _worker_fields = fields
+    _worker_template = CompiledTemplate.load(template_abs) if template_abs else None
+
+
+def _render_one(task: tuple[dict, str]) -> tuple[str, str | None]:
+    data, out_path = task
+    try:
+        if _worker_template is not None:
+            _worker_template.save_rendered(build_placeholders(_worker_fields, data), out_path)
+        else:
+            build_plain_report(_worker_fields, data).save(out_path)
+    except Exception as e:
+        return out_path, str(e)
+    return out_path, None
+
+
+def batch_workers() -> int:
+    workers = int(SETTINGS.get("batch_workers") or 0)
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def run_batch(
+    fields: list[dict],
+    template_abs: str | None,
+    rows: list[dict],
+    out_dir: str,
+    workers: int | None = None,
+    progress=None,
+    cancel_event=None,
+    output_format: str = "docx",
+) -> BatchResult:
+    os.makedirs(out_dir, exist_ok=True)
+    if workers is None:
+        workers = batch_workers()
+
+    tasks = plan_outputs(fields, rows, out_dir, ext="." + output_format)
+    result = BatchResult(len(tasks))
+    started = time.perf_counter()
+    lock = threading.Lock()
+
+    row_data = {out_path: data for data, out_path in tasks}
+
+    def finish(out_path, error):
+        with lock:
+            if error is None:
+                result.done.append(out_path)
+                result.reports.append((row_data[out_path], out_path))
+            else:
+                result.failed.append((out_path, error))
+            if progress is not None:
+                progress(len(result.done) + len(result.failed), len(tasks))
+
+    converter = None
+    render_dir = None
+    targets = {}
+    convert_executor = None
+    if output_format == "pdf":
+        from convert import get_converter_pool
+
+        # DOCX рендерятся во временную папку, а тёплые офисы пула
+        # конвертируют их в PDF параллельно с рендерингом остальных строк
+        converter = get_converter_pool()
+        render_dir = tempfile.mkdtemp(prefix="docform_batch_")
+        render_tasks = []
+        for data, out_path in tasks:
+            docx_path = os.path.join(render_dir, os.path.splitext(os.path.basename(out_path))[0] + ".docx")
+            targets[docx_path] = out_path
+            render_tasks.append((data, docx_path))
+        tasks_to_render = render_tasks
+        convert_executor = ThreadPoolExecutor(max_workers=converter.size)
+
+        def convert_one(docx_path):
+            out_path = targets[docx_path]
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            try:
+                seconds = converter.convert(docx_path, out_path)
+            except Exception as e:
+                finish(out_path, str(e))
+                return
+            with lock:
+                result.convert_seconds.append(seconds)
+            finish(out_path, None)
+    else:
+        tasks_to_render = tasks
+
+    def collect(outcomes):
+        for out_path, error in outcomes:
+            if error is not None:
+                finish(targets[out_path] if converter is not None else out_path, error)
+            elif converter is not None:
+                convert_executor.submit(convert_one, out_path)
+            else:
+                finish(out_path, None)
+            if cancel_event is not None and cancel_event.is_set():
+                break
+
+    try:
+        if workers <= 1 or len(tasks) < 2:
+            _init_worker(fields, template_abs)
+            collect(map(_render_one, tasks_to_render))
+        else:
+            workers = min(workers, len(tasks))
+            # пачками, чтобы не гонять каждую строку через межпроцессный канал отдельно
+            chunksize = max(1, len(tasks) // (workers * 8))
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(fields, template_abs),
+            )
+            try:
+                collect(executor.map(_render_one, tasks_to_render, chunksize=chunksize))
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+    finally:
+        if convert_executor is not None:
+            convert_executor.shutdown(wait=True)
+        if render_dir is not None:
+            shutil.rmtree(render_dir, ignore_errors=True)
+
+    result.seconds = time.perf_counter() - started
+    return result
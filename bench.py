@@ -0,0 +1,377 @@
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from config import STORAGE_DIR
+
+BENCH_DIR = os.path.join(STORAGE_DIR, "bench")
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+DEFAULT_THRESHOLD = 0.2
+
+LOREM = (
+    "Lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua"
+)
+
+
+# --- синтетические документы; всё генерируется локально ---
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(path: str, pages: int, lines_per_page: int = 45):
+    # минимальный PDF без сторонних библиотек: шрифт Helvetica, по потоку текста на страницу
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # дерево страниц — когда известны номера объектов страниц
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for p in range(pages):
+        lines = [f"Page {p + 1} line {i + 1}: {LOREM}" for i in range(lines_per_page)]
+        ops = ["BT", "/F1 9 Tf", "11 TL", "36 806 Td"]
+        ops += [f"({_pdf_escape(line)}) '" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (i, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    with open(path, "wb") as f:
+        f.write(out.getvalue())
+
+
+def make_template(path: str, placeholders: int):
+    # маркеры поровну в тексте, таблице, колонтитулах; каждый третий
+    # разбит на два run-а, как это делает Word
+    from docx import Document
+
+    doc = Document()
+    section = doc.sections[0]
+    table = doc.add_table(rows=0, cols=2)
+    for i in range(placeholders):
+        name = f"F{i}"
+        where = i % 4
+        if where == 0:
+            p = doc.add_paragraph(f"Пункт {i}: ")
+        elif where == 1:
+            cells = table.add_row().cells
+            cells[0].text = f"Поле {i}"
+            p = cells[1].paragraphs[0]
+        elif where == 2:
+            p = section.header.add_paragraph()
+        else:
+            p = section.footer.add_paragraph()
+        if i % 3 == 0:
+            p.add_run("{{" + name[:1])
+            p.add_run(name[1:] + "}}")
+        else:
+            p.add_run("{{" + name + "}}")
+    doc.save(path)
+
+
+def make_word(path: str, paragraphs: int):
+    from docx import Document
+
+    doc = Document()
+    for i in range(paragraphs):
+        doc.add_paragraph(f"{i + 1}. {LOREM}")
+    doc.save(path)
+
+
+def make_xlsx(path: str, rows: int, cols: int):
+    from openpyxl import Workbook
+
+    book = Workbook(write_only=True)
+    sheet = book.create_sheet("Данные")
+    sheet.append([f"C{c}" for c in range(cols)])
+    for r in range(rows):
+        sheet.append([r * cols + c if c % 2 else f"r{r}c{c}" for c in range(cols)])
+    book.save(path)
+
+
+def fixture(name: str, maker, *args) -> str:
+    # готовые файлы переиспользуются между запусками
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    path = os.path.join(FIXTURES_DIR, name)
+    if not os.path.exists(path):
+        tmp_path = path + ".tmp" + os.path.splitext(name)[1]
+        maker(tmp_path, *args)
+        os.replace(tmp_path, path)
+    return path
+
+
+# --- замеры ---
+
+def measure(fn, setup=None, repeat: int = 3) -> dict:
+    # время — медиана по повторам; пиковая память — отдельным прогоном под
+    # tracemalloc (он замедляет код). Память дочерних процессов не видна.
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        gc.collect()
+        t0 = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - t0)
+
+    arg = setup() if setup is not None else None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "median_s": round(statistics.median(times), 6),
+        "min_s": round(min(times), 6),
+        "peak_mb": round(peak / 2**20, 3),
+    }
+
+
+def build_stages(args) -> list[tuple]:
+    # (имя, функция) — функция готовит файлы и возвращает (fn, setup)
+    from readers import read_excel, read_pdf, read_word
+
+    stages = []
+
+    for pages in args.pdf_pages:
+        def pdf(pages=pages, workers=1, min_pages=None):
+            path = fixture(f"pages_{pages}.pdf", make_pdf, pages)
+            return lambda _: read_pdf(path, workers=workers, min_pages=min_pages), None
+
+        stages.append((f"read_pdf[{pages}p]", pdf))
+        stages.append((
+            f"read_pdf_parallel[{pages}p]",
+            lambda pages=pages: pdf(pages, workers=None, min_pages=0),
+        ))
+
+    for paragraphs in args.word_paragraphs:
+        def word(paragraphs=paragraphs):
+            path = fixture(f"text_{paragraphs}.docx", make_word, paragraphs)
+            return lambda _: read_word(path), None
+
+        stages.append((f"read_word[{paragraphs}par]", word))
+
+    for shape in args.xlsx:
+        rows, cols = (int(v) for v in shape.lower().split("x"))
+
+        def excel(rows=rows, cols=cols):
+            path = fixture(f"sheet_{rows}x{cols}.xlsx", make_xlsx, rows, cols)
+            return lambda _: read_excel(path), None
+
+        stages.append((f"read_excel[{rows}x{cols}]", excel))
+
+    for count in args.placeholders:
+        stages.extend(_template_stages(count))
+
+    if args.only:
+        stages = [s for s in stages if any(part in s[0] for part in args.only)]
+    return stages
+
+
+def _template_stages(count: int) -> list[tuple]:
+    from render import (
+        CompiledTemplate,
+        apply_template,
+        build_placeholders,
+        compile_template,
+    )
+
+    fields = [{"name": f"F{i}", "label": f"Поле {i}", "type": "text"} for i in range(count)]
+    data = {f["name"]: f"значение {i}" for i, f in enumerate(fields)}
+    values = build_placeholders(fields, data)
+
+    def template_path():
+        return fixture(f"template_{count}.docx", make_template, count)
+
+    def compile_stage():
+        from docx import Document
+
+        path = template_path()
+        return lambda doc: compile_template(path, doc), lambda: Document(path)
+
+    def apply_stage():
+        from docx import Document
+
+        path = template_path()
+        return lambda doc: apply_template(doc, values), lambda: Document(path)
+
+    def save_report_stage():
+        # путь кнопки «Сохранить отчёт»: загрузка, подстановка, doc.save
+        path = template_path()
+        compile_template(path)
+
+        def run(_):
+            CompiledTemplate.load(path).render(values).save(io.BytesIO())
+
+        return run, None
+
+    def save_rendered_stage():
+        # путь пакетной генерации: шаблон разобран один раз
+        path = template_path()
+        template = CompiledTemplate.load(path)
+        return lambda _: template.save_rendered(values, io.BytesIO()), None
+
+    return [
+        (f"compile_template[{count}]", compile_stage),
+        (f"apply_template[{count}]", apply_stage),
+        (f"save_report[{count}]", save_report_stage),
+        (f"save_rendered[{count}]", save_rendered_stage),
+    ]
+
+
+def run_stages(args) -> dict:
+    results = {}
+    for name, prepare in build_stages(args):
+        print(f"{name} ...", end=" ", file=sys.stderr, flush=True)
+        try:
+            fn, setup = prepare()
+            result = measure(fn, setup, repeat=args.repeat)
+        except Exception as e:
+            # нет библиотеки или ошибка в коде — остальные этапы всё равно меряем
+            result = {"error": f"{type(e).__name__}: {e}"}
+            print(result["error"], file=sys.stderr)
+        else:
+            print(f"{result['median_s'] * 1000:.1f} ms, {result['peak_mb']:.1f} MB", file=sys.stderr)
+        results[name] = result
+    return results
+
+
+def _meta() -> dict:
+    return {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+# --- сравнение с эталоном ---
+
+def compare(baseline: dict, current: dict, threshold: float) -> tuple[list[str], int]:
+    # строки отчёта и число регрессий; этапы, ставшие медленнее
+    # или прожорливее порога, помечены
+    lines = []
+    regressions = 0
+    base_results = baseline.get("results", {})
+    for name, now in current.get("results", {}).items():
+        base = base_results.get(name)
+        if base is None or "error" in base or "error" in now:
+            lines.append(f"  {name:<32} нет данных для сравнения")
+            continue
+        ratio = now["median_s"] / base["median_s"] if base["median_s"] else 1.0
+        mem_ratio = now["peak_mb"] / base["peak_mb"] if base["peak_mb"] else 1.0
+        marks = []
+        if ratio > 1 + threshold:
+            marks.append("МЕДЛЕННЕЕ")
+        if mem_ratio > 1 + threshold:
+            marks.append("БОЛЬШЕ ПАМЯТИ")
+        if marks:
+            regressions += 1
+        lines.append(
+            f"{'!' if marks else ' '} {name:<32} "
+            f"{base['median_s'] * 1000:9.1f} -> {now['median_s'] * 1000:9.1f} ms (x{ratio:.2f})  "
+            f"{base['peak_mb']:7.1f} -> {now['peak_mb']:7.1f} MB  {' '.join(marks)}"
+        )
+    lines.append(f"Регрессий: {regressions} (порог {threshold:.0%})")
+    return lines, regressions
+
+
+def _load_json(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cmd_run(args) -> int:
+    report = {"meta": _meta(), "params": {
+        "pdf_pages": args.pdf_pages,
+        "word_paragraphs": args.word_paragraphs,
+        "xlsx": args.xlsx,
+        "placeholders": args.placeholders,
+        "repeat": args.repeat,
+    }}
+    report["results"] = run_stages(args)
+
+    out = args.out
+    if out is None:
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        out = os.path.join(BENCH_DIR, time.strftime("bench-%Y%m%d-%H%M%S.json"))
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {out}")
+
+    if args.baseline:
+        lines, regressions = compare(_load_json(args.baseline), report, args.threshold)
+        print("\n".join(lines))
+        return 1 if regressions else 0
+    return 0
+
+
+def cmd_compare(args) -> int:
+    lines, regressions = compare(_load_json(args.baseline), _load_json(args.current), args.threshold)
+    print("\n".join(lines))
+    return 1 if regressions else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="bench", description="Замеры чтения документов и генерации отчётов")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="прогнать замеры и сохранить JSON")
+    run.add_argument("-o", "--out", help="файл результатов (по умолчанию storage/bench/bench-<время>.json)")
+    run.add_argument("-r", "--repeat", type=int, default=3, help="повторов на этап")
+    run.add_argument("--only", nargs="+", metavar="ИМЯ", help="только этапы, в имени которых есть подстрока")
+    run.add_argument("--pdf-pages", nargs="*", type=int, default=[50, 300], metavar="N")
+    run.add_argument("--word-paragraphs", nargs="*", type=int, default=[20_000], metavar="N")
+    run.add_argument("--xlsx", nargs="*", default=["50000x10", "200x500"], metavar="СТРОКxСТОЛБЦЫ")
+    run.add_argument("--placeholders", nargs="*", type=int, default=[100, 2000], metavar="M")
+    run.add_argument("--baseline", help="сразу сравнить с эталонным JSON")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="допустимое замедление (0.2 = 20%%)")
+    run.set_defaults(func=cmd_run)
+
+    cmp = commands.add_parser("compare", help="сравнить два файла результатов")
+    cmp.add_argument("baseline", help="эталонный JSON")
+    cmp.add_argument("current", help="новый JSON")
+    cmp.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="допустимое замедление (0.2 = 20%%)")
+    cmp.set_defaults(func=cmd_compare)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    # read_pdf_parallel запускает процессы — нужно для собранного exe
+    import multiprocessing
+
+    multiprocessing.freeze_support()
+    sys.exit(main())
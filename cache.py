@@ -0,0 +1,147 @@
+import codecs
+import hashlib
+import os
+import tempfile
+import zlib
+
+from config import SETTINGS, STORAGE_DIR
+
+CACHE_DIR = os.path.join(STORAGE_DIR, "cache")
+
+# увеличить, если меняется то, что выдают читалки, — старые записи
+# просто перестанут находиться и со временем вытеснятся
+CACHE_VERSION = 3
+
+CACHE_SUFFIX = ".txt.z"
+READ_BLOCK_SIZE = 256 * 1024
+
+
+# Кэш извлечённого текста: ключ — путь + время изменения + размер файла,
+# значение — текст, сжатый zlib. При превышении лимита удаляются записи,
+# которые дольше всего не открывали (время доступа хранится в mtime файла).
+class TextCache:
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int | None = None):
+        self.directory = directory
+        if max_bytes is None:
+            max_bytes = int(SETTINGS.get("cache_max_mb") or 0) * 1024 * 1024
+        self.max_bytes = max_bytes
+
+    def key(self, path: str) -> str:
+        st = os.stat(path)
+        raw = f"{CACHE_VERSION}|{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def iter_cached(self, key: str):
+        # None — записи нет; иначе генератор кусков текста
+        entry = self._entry_path(key)
+        try:
+            f = open(entry, "rb")
+        except OSError:
+            return None
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return self._iter_entry(f)
+
+    @staticmethod
+    def _iter_entry(f):
+        decompressor = zlib.decompressobj()
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        with f:
+            while True:
+                block = f.read(READ_BLOCK_SIZE)
+                if not block:
+                    break
+                text = decoder.decode(decompressor.decompress(block))
+                if text:
+                    yield text
+            tail = decoder.decode(decompressor.flush(), final=True)
+            if not decompressor.eof:
+                # файл обрезан: zlib сам об этом не скажет
+                raise zlib.error("incomplete cache entry")
+            if tail:
+                yield tail
+
+    def remove(self, key: str):
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def writer(self, key: str) -> "CacheWriter":
+        os.makedirs(self.directory, exist_ok=True)
+        return CacheWriter(self, key)
+
+    def entries(self) -> list[tuple[float, int, str]]:
+        result = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return result
+        for name in names:
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            entry = os.path.join(self.directory, name)
+            try:
+                st = os.stat(entry)
+            except OSError:
+                continue
+            result.append((st.st_mtime, st.st_size, entry))
+        return result
+
+    def total_size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        if self.max_bytes <= 0:
+            return
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for _, _, entry in self.entries():
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+
+
+# Сжимает текст по мере поступления кусков во временный файл;
+# запись появляется в кэше только после commit(). У каждого писателя свой
+# временный файл: один и тот же документ могут читать два потока сразу
+# (повторное открытие, пока отменённая загрузка ещё не остановилась).
+class CacheWriter:
+    def __init__(self, cache: TextCache, key: str):
+        self.cache = cache
+        self.target = cache._entry_path(key)
+        fd, self.tmp_path = tempfile.mkstemp(prefix=key + ".", suffix=".tmp", dir=cache.directory)
+        self._file = os.fdopen(fd, "wb")
+        self._compressor = zlib.compressobj(6)
+
+    def write(self, chunk: str):
+        self._file.write(self._compressor.compress(chunk.encode("utf-8")))
+
+    def commit(self):
+        self._file.write(self._compressor.flush())
+        self._file.close()
+        os.replace(self.tmp_path, self.target)
+        self.cache.evict()
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
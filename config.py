@@ -0,0 +1,343 @@
+import json
+import logging
+import os
+import copy
+import hashlib
+import queue
+import re
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORAGE_DIR = os.path.join(BASE_DIR, "storage")
+os.makedirs(STORAGE_DIR, exist_ok=True)
+
+CONFIG_FILE = os.path.join(STORAGE_DIR, "fields_config.json")
+# каждый шаблон полей лежит в своём файле; fields_config.json хранит
+# только порядок шаблонов и текущий
+PROFILES_DIR = os.path.join(STORAGE_DIR, "profiles")
+CONFIG_FORMAT = 2
+
+log = logging.getLogger("docform")
+
+DEFAULT_PROFILE_NAME = "default"
+
+DEFAULT_FIELDS = [
+    {
+        "name": "NAME",
+        "label": "ФИО",
+        "type": "text",
+    },
+    {
+        "name": "ORGANIZATION",
+        "label": "Организация",
+        "type": "text",
+    },
+    {
+        "name": "COMMENT",
+        "label": "Комментарий",
+        "type": "multiline",
+    },
+]
+
+
+def default_config():
+    return {
+        "current_profile": DEFAULT_PROFILE_NAME,
+        "profiles": {
+            DEFAULT_PROFILE_NAME: {
+                "fields": copy.deepcopy(DEFAULT_FIELDS),
+                "template_path": None,
+            }
+        },
+    }
+
+
+def load_config():
+    if not os.path.exists(CONFIG_FILE):
+        return default_config()
+
+    try:
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return default_config()
+
+    if isinstance(data, dict) and data.get("format") == CONFIG_FORMAT:
+        profiles = {}
+        for name in data.get("profiles") or []:
+            try:
+                with open(profile_file(name), "r", encoding="utf-8") as f:
+                    prof = json.load(f)
+            except Exception:
+                prof = None
+            if isinstance(prof, dict):
+                prof.pop("name", None)
+            profiles[name] = prof
+        data = {"current_profile": data.get("current_profile"), "profiles": profiles}
+
+    if isinstance(data, list):
+        return {
+            "current_profile": DEFAULT_PROFILE_NAME,
+            "profiles": {
+                DEFAULT_PROFILE_NAME: {
+                    "fields": data,
+                    "template_path": None,
+                }
+            },
+        }
+
+    if isinstance(data, dict) and "fields" in data and "profiles" not in data:
+        return {
+            "current_profile": DEFAULT_PROFILE_NAME,
+            "profiles": {
+                DEFAULT_PROFILE_NAME: {
+                    "fields": data.get("fields", copy.deepcopy(DEFAULT_FIELDS)),
+                    # тут может быть абсолютный путь старого формата
+                    "template_path": data.get("template_path"),
+                }
+            },
+        }
+
+    if isinstance(data, dict) and "profiles" in data:
+        profiles = data.get("profiles") or {}
+        if not profiles:
+            return default_config()
+
+        current = data.get("current_profile") or list(profiles.keys())[0]
+        if current not in profiles:
+            current = list(profiles.keys())[0]
+
+        for name, prof in list(profiles.items()):
+            if not isinstance(prof, dict):
+                profiles[name] = {
+                    "fields": copy.deepcopy(DEFAULT_FIELDS),
+                    "template_path": None,
+                }
+                continue
+            if "fields" not in prof:
+                prof["fields"] = copy.deepcopy(DEFAULT_FIELDS)
+            if "template_path" not in prof:
+                prof["template_path"] = None
+
+        return {
+            "current_profile": current,
+            "profiles": profiles,
+        }
+
+    return default_config()
+
+
+def profile_file(name: str) -> str:
+    # имена шаблонов бывают любыми (кириллица, пробелы) — добавляем хэш,
+    # чтобы «a/b» и «a_b» не попали в один файл
+    safe = re.sub(r'[<>:"/\\|?*\s]+', "_", name).strip("._")[:60] or "profile"
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(PROFILES_DIR, f"{safe}-{digest}.json")
+
+
+def atomic_write_text(path: str, text: str):
+    # пишем во временный файл рядом и подменяем: при сбое посреди записи
+    # старый файл остаётся целым
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def serialize_config(profiles: dict, current_profile: str) -> dict[str, str]:
+    # путь файла -> содержимое
+    files = {
+        CONFIG_FILE: json.dumps(
+            {
+                "format": CONFIG_FORMAT,
+                "current_profile": current_profile,
+                "profiles": list(profiles.keys()),
+            },
+            ensure_ascii=False,
+            indent=2,
+        )
+    }
+    for name, prof in profiles.items():
+        files[profile_file(name)] = json.dumps(
+            {"name": name, **prof}, ensure_ascii=False, indent=2
+        )
+    return files
+
+
+def write_config_files(files: dict[str, str], written: dict[str, str]):
+    # импорт здесь: instrument сам берёт настройки из этого модуля
+    from instrument import span
+
+    with span("save_config", files=len(files)) as sp:
+        sp.note(written=_write_config_files(files, written))
+
+
+def _write_config_files(files: dict[str, str], written: dict[str, str]) -> int:
+    # пишутся только файлы, содержимое которых изменилось; файлы удалённых
+    # шаблонов убираются. written — что уже лежит на диске (обновляется).
+    # Возвращает число записанных файлов
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    changed = 0
+
+    # сначала шаблоны, потом оглавление — оно не должно ссылаться на то,
+    # чего ещё нет на диске
+    for path in sorted(files, key=lambda p: p == CONFIG_FILE):
+        text = files[path]
+        if path not in written:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    written[path] = f.read()
+            except OSError:
+                pass
+        if written.get(path) == text:
+            continue
+        atomic_write_text(path, text)
+        written[path] = text
+        changed += 1
+
+    for name in os.listdir(PROFILES_DIR):
+        path = os.path.join(PROFILES_DIR, name)
+        if name.endswith(".json") and path not in files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            written.pop(path, None)
+    return changed
+
+
+# Запись конфига в фоновом потоке. submit() снимает копию (сериализует)
+# в вызывающем потоке, поток записи берёт только последнюю из накопившихся.
+class ConfigWriter:
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._written = {}
+        self.last_error = None
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def submit(self, profiles: dict, current_profile: str):
+        self._queue.put(serialize_config(profiles, current_profile))
+
+    def flush(self):
+        self._queue.join()
+
+    def _work(self):
+        while True:
+            files = self._queue.get()
+            skipped = 0
+            # из пачки снимков важен только последний
+            while True:
+                try:
+                    files = self._queue.get_nowait()
+                    skipped += 1
+                except queue.Empty:
+                    break
+            try:
+                write_config_files(files, self._written)
+                self.last_error = None
+            except Exception as e:
+                log.exception("Не удалось сохранить конфиг")
+                self.last_error = e
+                # при следующей записи сверяемся с диском заново
+                self._written.clear()
+            finally:
+                for _ in range(skipped + 1):
+                    self._queue.task_done()
+
+
+def config_stamp():
+    # меняется при любой записи конфига — для кэшей, которые его читают
+    stamps = []
+    for path in [CONFIG_FILE] + (
+        [os.path.join(PROFILES_DIR, n) for n in sorted(os.listdir(PROFILES_DIR))]
+        if os.path.isdir(PROFILES_DIR)
+        else []
+    ):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stamps.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(stamps)
+
+
+def template_abs_path(template_path: str | None) -> str | None:
+    if not template_path:
+        return None
+    if os.path.isabs(template_path):
+        return template_path
+    return os.path.join(STORAGE_DIR, template_path)
+
+
+SETTINGS_FILE = os.path.join(STORAGE_DIR, "settings.json")
+
+DEFAULT_SETTINGS = {
+    # PDF от стольки страниц разбирается параллельно в нескольких процессах
+    "pdf_parallel_min_pages": 40,
+    # 0 — по числу ядер процессора
+    "pdf_workers": 0,
+    # кэш извлечённого текста в storage/cache
+    "cache_enabled": True,
+    "cache_max_mb": 200,
+    # пакетная генерация отчётов; 0 — по числу ядер
+    "batch_workers": 0,
+    # Excel показывается порциями: столько строк листа за раз
+    "excel_rows_per_load": 2000,
+    # документы длиннее (в символах) показываются окном: в виджете только видимая часть
+    "viewer_window_threshold_chars": 2_000_000,
+    # LibreOffice для .doc и PDF; пусто — искать автоматически
+    "soffice_path": "",
+    "convert_timeout_s": 120,
+    # сколько экземпляров LibreOffice держать запущенными для PDF; 0 — два
+    "pdf_converters": 0,
+    # время от запуска процесса до первой отрисовки окна пишется в storage/startup.log
+    "startup_log": True,
+    "startup_budget_ms": 2000,
+    # черновик формы пишется в storage/drafts.journal пачками раз в столько мс;
+    # журнал больше стольких КБ переписывается одним снимком
+    "journal_flush_ms": 1000,
+    "journal_compact_kb": 256,
+    # замеры операций (чтение, форма, отчёт, конфиг) в storage/logs/docform.log
+    "instrument_enabled": True,
+    "instrument_log_kb": 1024,
+    # последний замер в строке состояния окна
+    "instrument_status_bar": False,
+    # больше 0 — операции профилируются cProfile, профиль самой свежей
+    # из тех, что дольше стольких мс, сохраняется в storage/logs/last_slow.prof
+    "instrument_profile_slow_ms": 0,
+    # введённые в отчёты значения полей хранятся в storage/history.sqlite3
+    # и подсказываются при вводе; сверх лимита на поле вытесняются редкие и давние
+    "history_enabled": True,
+    "history_max_per_field": 20_000,
+    # каждый сохранённый отчёт (шаблон, значения, пути) — в storage/archive.sqlite3
+    "archive_enabled": True,
+}
+
+
+def load_settings():
+    settings = dict(DEFAULT_SETTINGS)
+    if not os.path.exists(SETTINGS_FILE):
+        return settings
+    try:
+        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return settings
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key in settings:
+                settings[key] = value
+    return settings
+
+
+SETTINGS = load_settings()
@@ -0,0 +1,206 @@
+import atexit
+import os
+import pathlib
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from config import SETTINGS, STORAGE_DIR, log
+
+LO_PROFILE_DIR = os.path.join(STORAGE_DIR, "lo_profile")
+
+WINDOWS_SOFFICE_PATHS = (
+    r"C:\Program Files\LibreOffice\program\soffice.exe",
+    r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
+)
+
+
+class ConverterNotFound(RuntimeError):
+    pass
+
+
+def find_soffice() -> str | None:
+    configured = SETTINGS.get("soffice_path")
+    if configured and os.path.exists(configured):
+        return configured
+    for name in ("soffice", "libreoffice"):
+        found = shutil.which(name)
+        if found:
+            return found
+    if sys.platform == "win32":
+        for candidate in WINDOWS_SOFFICE_PATHS:
+            if os.path.exists(candidate):
+                return candidate
+    return None
+
+
+def _profile_uri(profile_dir: str) -> str:
+    # свой профиль LibreOffice, чтобы не мешать открытому у пользователя офису
+    return "-env:UserInstallation=" + pathlib.Path(profile_dir).resolve().as_uri()
+
+
+def _no_window_flags() -> int:
+    return getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+
+def convert_file(src: str, fmt: str, out_dir: str, profile_dir: str = LO_PROFILE_DIR) -> str:
+    # однократная конвертация LibreOffice без интерфейса, полностью локально
+    soffice = find_soffice()
+    if soffice is None:
+        raise ConverterNotFound(
+            "Не найден LibreOffice. Установите его или укажите путь к soffice "
+            "в storage/settings.json (soffice_path)."
+        )
+    os.makedirs(out_dir, exist_ok=True)
+    subprocess.run(
+        [
+            soffice, _profile_uri(profile_dir),
+            "--headless", "--norestore", "--nologo",
+            "--convert-to", fmt, "--outdir", out_dir, src,
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        timeout=int(SETTINGS.get("convert_timeout_s") or 120),
+        creationflags=_no_window_flags(),
+    )
+    ext = fmt.split(":", 1)[0]
+    out_path = os.path.join(out_dir, os.path.splitext(os.path.basename(src))[0] + "." + ext)
+    if not os.path.exists(out_path):
+        raise RuntimeError(f"LibreOffice не создал файл {os.path.basename(out_path)}")
+    return out_path
+
+
+def _wait_for_output(path: str, deadline: float):
+    # запрос, переданный запущенному офису, может вернуться раньше, чем
+    # файл дописан: ждём, пока он появится и перестанет расти
+    last_size = -1
+    while time.monotonic() < deadline:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = -1
+        if size > 0 and size == last_size:
+            return
+        last_size = size
+        time.sleep(0.1)
+    raise TimeoutError(f"LibreOffice не закончил {os.path.basename(path)} за отведённое время")
+
+
+# Постоянно запущенный LibreOffice без интерфейса со своим профилем.
+# Повторный вызов soffice с тем же профилем не поднимает новый офис, а
+# передаёт задание уже запущенному — так конвертация не платит за старт.
+# Если тёплый процесс умер (или ещё не успел подняться и задание выполнил
+# сам вызов), он перезапускается к следующей конвертации.
+class WarmConverter:
+    def __init__(self, soffice: str, profile_dir: str):
+        self.soffice = soffice
+        self.profile_dir = profile_dir
+        self.process = None
+
+    def start(self):
+        if self.process is not None and self.process.poll() is None:
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        pipe_name = f"docform_{os.getpid()}_{os.path.basename(self.profile_dir)}"
+        self.process = subprocess.Popen(
+            [
+                self.soffice, _profile_uri(self.profile_dir),
+                "--headless", "--invisible", "--norestore", "--nologo", "--nodefault",
+                # слушающий канал не даёт офису завершиться без документов
+                f"--accept=pipe,name={pipe_name};urp;",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            creationflags=_no_window_flags(),
+        )
+
+    def convert(self, src: str, fmt: str, out_path: str):
+        self.start()
+        timeout = int(SETTINGS.get("convert_timeout_s") or 120)
+        deadline = time.monotonic() + timeout
+        ext = fmt.split(":", 1)[0]
+        with tempfile.TemporaryDirectory(prefix="docform_conv_") as tmp:
+            subprocess.run(
+                [
+                    self.soffice, _profile_uri(self.profile_dir),
+                    "--headless", "--norestore", "--nologo",
+                    "--convert-to", fmt, "--outdir", tmp, src,
+                ],
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=timeout,
+                creationflags=_no_window_flags(),
+            )
+            produced = os.path.join(tmp, os.path.splitext(os.path.basename(src))[0] + "." + ext)
+            _wait_for_output(produced, deadline)
+            shutil.move(produced, out_path)
+
+    def close(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+
+def converter_count() -> int:
+    count = int(SETTINGS.get("pdf_converters") or 0)
+    return count if count > 0 else 2
+
+
+# Пул тёплых конвертеров. convert() берёт свободный офис, ждёт, если все
+# заняты, и возвращает время конвертации в секундах.
+class ConverterPool:
+    def __init__(self, size: int | None = None):
+        soffice = find_soffice()
+        if soffice is None:
+            raise ConverterNotFound(
+                "Не найден LibreOffice. Установите его или укажите путь к soffice "
+                "в storage/settings.json (soffice_path)."
+            )
+        self.size = size or converter_count()
+        self._idle = queue.Queue()
+        self._converters = []
+        for i in range(self.size):
+            converter = WarmConverter(soffice, f"{LO_PROFILE_DIR}_pool{i}")
+            converter.start()
+            self._converters.append(converter)
+            self._idle.put(converter)
+
+    def convert(self, src: str, out_path: str, fmt: str = "pdf") -> float:
+        converter = self._idle.get()
+        started = time.perf_counter()
+        try:
+            converter.convert(src, fmt, out_path)
+        finally:
+            self._idle.put(converter)
+        seconds = time.perf_counter() - started
+        log.info("Конвертация %s: %.2f с", os.path.basename(out_path), seconds)
+        return seconds
+
+    def close(self):
+        for converter in self._converters:
+            converter.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_converter_pool() -> ConverterPool:
+    # один пул на процесс: офисы поднимаются при первой конвертации
+    # и живут до выхода из программы
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConverterPool()
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,132 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+from config import SETTINGS, load_config, template_abs_path
+
+
+def _get_profile(name: str | None) -> tuple[str, dict]:
+    cfg = load_config()
+    name = name or cfg["current_profile"]
+    if name not in cfg["profiles"]:
+        raise SystemExit(f"Шаблон полей не найден: {name}")
+    return name, cfg["profiles"][name]
+
+
+def cmd_batch(args) -> int:
+    from batch import read_rows, run_batch
+
+    profile_name, profile = _get_profile(args.profile)
+    tmpl_abs = template_abs_path(profile.get("template_path"))
+    if tmpl_abs and not os.path.exists(tmpl_abs):
+        tmpl_abs = None
+
+    rows = read_rows(args.rows)
+
+    def progress(done, total):
+        print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True)
+
+    result = run_batch(
+        profile["fields"], tmpl_abs, rows, args.out,
+        workers=args.workers, progress=progress, output_format=args.format,
+    )
+    print(file=sys.stderr)
+
+    if SETTINGS.get("archive_enabled") and result.reports:
+        from archive import ReportArchive
+
+        archive = ReportArchive()
+        archive.record_many(profile_name, result.reports, os.path.abspath(args.rows))
+        archive.close()
+
+    for out_path, error in result.failed:
+        print(f"Ошибка: {out_path}: {error}", file=sys.stderr)
+    print(
+        f"Готово: {len(result.done)} из {result.total} отчётов за {result.seconds:.2f} с "
+        f"({result.throughput:.1f} отч./с)"
+    )
+    if result.convert_seconds:
+        print(
+            f"Конвертация в PDF: в среднем {result.mean_convert_seconds:.2f} с, "
+            f"максимум {max(result.convert_seconds):.2f} с"
+        )
+    return 1 if result.failed else 0
+
+
+def _parse_values(args) -> dict:
+    values = {}
+    if args.json:
+        if args.json == "-":
+            values.update(json.load(sys.stdin))
+        else:
+            with open(args.json, "r", encoding="utf-8") as f:
+                values.update(json.load(f))
+    for item in args.set or []:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"Ожидается ИМЯ=значение: {item}")
+        values[name.strip().upper()] = value
+    return values
+
+
+def cmd_render(args) -> int:
+    from render import render
+
+    try:
+        data = render(args.profile, _parse_values(args))
+    except KeyError as e:
+        raise SystemExit(e.args[0])
+
+    if args.out == "-":
+        sys.stdout.buffer.write(data)
+    elif args.out.lower().endswith(".pdf"):
+        import tempfile
+        from convert import get_converter_pool
+
+        with tempfile.TemporaryDirectory(prefix="docform_report_") as tmp:
+            docx_path = os.path.join(tmp, "report.docx")
+            with open(docx_path, "wb") as f:
+                f.write(data)
+            seconds = get_converter_pool().convert(docx_path, args.out)
+        print(f"Конвертация в PDF: {seconds:.2f} с", file=sys.stderr)
+    else:
+        with open(args.out, "wb") as f:
+            f.write(data)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="docform", description="DocForm без графического интерфейса")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    render = commands.add_parser("render", help="один отчёт по значениям полей")
+    render.add_argument("-p", "--profile", help="шаблон полей (по умолчанию — текущий)")
+    render.add_argument("-o", "--out", required=True, help="файл DOCX или PDF, '-' — DOCX в stdout")
+    render.add_argument("-s", "--set", action="append", metavar="ИМЯ=значение", help="значение поля")
+    render.add_argument("--json", metavar="ФАЙЛ", help="JSON со значениями полей ('-' — stdin)")
+    render.set_defaults(func=cmd_render)
+
+    batch = commands.add_parser("batch", help="отчёты по строкам CSV/XLSX")
+    batch.add_argument("rows", help="CSV или XLSX: заголовки столбцов — имена полей")
+    batch.add_argument("-o", "--out", required=True, help="папка для готовых отчётов")
+    batch.add_argument("-p", "--profile", help="шаблон полей (по умолчанию — текущий)")
+    batch.add_argument("-j", "--workers", type=int, help="число процессов (по умолчанию — по числу ядер)")
+    batch.add_argument("-f", "--format", choices=("docx", "pdf"), default="docx", help="формат отчётов")
+    batch.set_defaults(func=cmd_batch)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    from instrument import setup_logging
+
+    setup_logging()
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
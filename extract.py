@@ -0,0 +1,245 @@
+import queue
+import re
+import threading
+
+from config import log
+from instrument import span
+
+REGEX_PREFIX = "re:"
+# значение после якоря: до конца строки или точки с запятой; в тексте из PDF
+# оно часто стоит на следующей строке — один перенос допускается
+ANCHOR_VALUE = r"[ \t]*[:№#\-—–]*[ \t]*(?:\r?\n[ \t]*)?(?P<v>[^\n;]{1,200})"
+MAX_SPANS = 50_000
+
+# начало регулярки до первого спецсимвола — из него берётся слово-триггер
+_LITERAL_PREFIX_RE = re.compile(r"[^\\^$.|?*+()\[\]{}]*")
+
+
+def rule_error(rule: str) -> str | None:
+    # текст ошибки для окна правки поля или None
+    try:
+        _compile_rule(rule or "")
+    except re.error as e:
+        return str(e)
+    return None
+
+
+def _compile_rule(rule: str, checkbox: bool = False) -> tuple[re.Pattern, str | int] | None:
+    # правило поля -> (регулярка, группа со значением); None — правила нет.
+    # Значение — группа v, иначе первая группа, иначе всё совпадение.
+    # Номер группы берётся у скомпилированной регулярки, а не из текста
+    # правила: скобки в [(] или именованные группы его не собьют.
+    rule = rule.strip()
+    if rule.startswith(REGEX_PREFIX):
+        body = rule[len(REGEX_PREFIX):]
+        if not body:
+            return None
+        pattern = re.compile(body, re.IGNORECASE)
+        if "v" in pattern.groupindex:
+            return pattern, "v"
+        return pattern, 1 if pattern.groups else 0
+
+    # якоря: «ИНН | Договор №» — любой из них целыми словами, пробелы внутри — любые
+    anchors = [a.strip() for a in rule.split("|") if a.strip()]
+    if not anchors:
+        return None
+    alternatives = "|".join(r"\s+".join(map(re.escape, a.split())) for a in anchors)
+    pattern = rf"(?<!\w)(?:{alternatives})(?!(?<=\w)\w)"
+    if checkbox:
+        # флажку значение после якоря не нужно: «Печать» может стоять в конце строки
+        return re.compile(pattern, re.IGNORECASE), 0
+    return re.compile(pattern + ANCHOR_VALUE, re.IGNORECASE), "v"
+
+
+def _triggers(rule: str) -> set[str] | None:
+    # строки (в нижнем регистре), с одной из которых обязано начинаться
+    # совпадение правила; None — если такой строки не вывести
+    rule = rule.strip()
+    if not rule.startswith(REGEX_PREFIX):
+        words = {a.split()[0].lower() for a in rule.split("|") if a.strip()}
+        return words or None
+
+    body = rule[len(REGEX_PREFIX):]
+    if "|" in body:
+        return None
+    prefix = _LITERAL_PREFIX_RE.match(body).group()
+    if body[len(prefix):len(prefix) + 1] in ("?", "*", "{"):
+        # последний символ необязателен
+        prefix = prefix[:-1]
+    if len(prefix) < 2:
+        return None
+    return {prefix.lower()}
+
+
+def _clean_value(value: str) -> str:
+    return value.strip().rstrip(".,").strip()
+
+
+# Все правила полей шаблона проверяются за один проход по тексту: у каждого
+# правила есть слово-триггер (первое слово якоря или начало регулярки), и
+# одна регулярка из одних только триггеров, по которой движок re ищет очень
+# быстро, находит места, где правило вообще может совпасть. Там правило
+# и проверяется. Регулярки без постоянного начала сканируются отдельно.
+class FieldExtractor:
+    def __init__(self, fields: list[dict]):
+        self.fields = {}
+        self.rules = {}
+        self.value_groups = {}
+        self.solo = []
+        by_trigger = {}
+        for i, f in enumerate(fields):
+            rule = (f.get("rule") or "").strip()
+            if not rule:
+                continue
+            try:
+                compiled = _compile_rule(rule, checkbox=f.get("type") == "checkbox")
+            except re.error:
+                continue
+            if compiled is None:
+                continue
+            group = f"r{i}"
+            self.rules[group], self.value_groups[group] = compiled
+            self.fields[group] = f
+            triggers = _triggers(rule)
+            if triggers is None:
+                self.solo.append(group)
+                continue
+            for word in triggers:
+                by_trigger.setdefault(word, []).append(group)
+
+        self.by_trigger = by_trigger
+        # триггеры с общим началом («суд», «судья») проверяются все
+        self.trigger_lengths = sorted({len(w) for w in by_trigger})
+        self.trigger_re = None
+        if by_trigger:
+            self.trigger_re = re.compile("|".join(map(re.escape, sorted(by_trigger))))
+
+    @property
+    def empty(self) -> bool:
+        return not self.fields
+
+    def scan(self, text: str, cancel_event=None) -> tuple[dict, list[tuple[int, int]]] | None:
+        # (поле -> значение первого совпадения, все совпадения для подсветки);
+        # None, если отменено
+        values = {}
+        spans = []
+        with span("extract_fields", chars=len(text), rules=len(self.fields)) as sp:
+            if self.trigger_re is not None:
+                lowered = text.lower()
+                if len(lowered) == len(text):
+                    trigger_re = self.trigger_re
+                else:
+                    # редкие символы меняют длину при смене регистра
+                    lowered = text
+                    trigger_re = re.compile(self.trigger_re.pattern, re.IGNORECASE)
+
+                # следующий поиск — со следующего символа, а не с конца
+                # найденного триггера: вхождения могут пересекаться
+                pos = 0
+                n = 0
+                while True:
+                    t = trigger_re.search(lowered, pos)
+                    if t is None:
+                        break
+                    start = t.start()
+                    for length in self.trigger_lengths:
+                        for group in self.by_trigger.get(lowered[start:start + length].lower(), ()):
+                            m = self.rules[group].match(text, start)
+                            if m:
+                                self._take(m, group, values, spans)
+                    pos = start + 1
+                    n += 1
+                    if n % 10_000 == 0 and cancel_event is not None and cancel_event.is_set():
+                        return None
+
+            for group in self.solo:
+                for m in self.rules[group].finditer(text):
+                    self._take(m, group, values, spans)
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+            spans.sort()
+            sp.note(found=len(values))
+        return values, spans
+
+    def _take(self, m, group: str, values: dict, spans: list):
+        f = self.fields[group]
+        if f.get("type") == "checkbox":
+            # для флажка важен сам факт вхождения — подсвечиваем его целиком
+            start, end = m.span()
+        else:
+            start, end = m.span(self.value_groups[group])
+            if start < 0:
+                # группа значения не участвовала в совпадении
+                start, end = m.span()
+        if len(spans) < MAX_SPANS:
+            spans.append((start, end))
+        name = f["name"]
+        if name in values:
+            return
+        if f.get("type") == "checkbox":
+            values[name] = True
+        else:
+            value = _clean_value(m.string[start:end])
+            if value:
+                values[name] = value
+
+
+# Извлечение в фоновом потоке, результат передаётся в Tk через after().
+# Результат для документа или шаблона, которые уже сменились, отбрасывается.
+class ExtractRunner:
+    POLL_MS = 100
+
+    def __init__(self, widget, on_ready):
+        self.widget = widget
+        self.on_ready = on_ready
+        self._queue = queue.Queue()
+        self._generation = 0
+        self._cancel_event = None
+        self._polling = False
+
+    def run(self, fields: list[dict], text: str, context=None):
+        self.cancel()
+        extractor = FieldExtractor(fields)
+        if extractor.empty or not text:
+            return False
+        self._generation += 1
+        self._cancel_event = threading.Event()
+        threading.Thread(
+            target=self._work,
+            args=(self._generation, extractor, text, self._cancel_event, context),
+            daemon=True,
+        ).start()
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.POLL_MS, self._poll)
+        return True
+
+    def cancel(self):
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+            self._cancel_event = None
+        self._generation += 1
+
+    def _work(self, generation, extractor, text, cancel_event, context):
+        try:
+            result = extractor.scan(text, cancel_event)
+        except Exception:
+            log.exception("Ошибка извлечения значений полей")
+            # пустой результат, чтобы опрос очереди остановился
+            result = ({}, [])
+        if result is not None:
+            self._queue.put((generation, result, context))
+
+    def _poll(self):
+        while True:
+            try:
+                generation, (values, spans), context = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self._generation:
+                self._cancel_event = None
+                self.on_ready(values, spans, context)
+        if self._cancel_event is not None:
+            self.widget.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
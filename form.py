@@ -0,0 +1,369 @@
+import bisect
+import tkinter as tk
+from tkinter import ttk
+
+# высота строки до первого замера виджета этого типа
+ESTIMATED_HEIGHTS = {"text": 50, "multiline": 100, "checkbox": 45}
+
+# сколько экранов сверху и снизу от видимой области создаётся заранее
+REALIZE_MARGIN_SCREENS = 1
+
+# тег привязок полей формы: фокус и правки многострочных полей ловятся
+# привязками класса, а не своей командой Tcl на каждое поле
+ROW_TAG = "DocFormRow"
+
+
+# Одно поле формы. Значение живёт в самой строке (value), а виджеты
+# создаются только когда строка впервые попадает в область видимости.
+class FormRow:
+    def __init__(self, name: str, label: str, ftype: str, value=None):
+        self.name = name
+        self.label_text = label
+        self.ftype = ftype
+        if value is None:
+            value = False if ftype == "checkbox" else ""
+        self.value = value
+        self.top = 0
+        self.panel = None
+        self.frame = None
+        self.label = None
+        self.widget = None
+        self.var = None
+
+    @property
+    def realized(self) -> bool:
+        return self.frame is not None
+
+    def realize(self, panel: "FormPanel"):
+        self.panel = panel
+        self.frame = ttk.Frame(panel.inner)
+        self.frame.columnconfigure(0, weight=1)
+        self.label = ttk.Label(self.frame, text=self.label_text)
+        self.label.grid(row=0, column=0, sticky="w", pady=(0, 2))
+
+        if self.ftype == "multiline":
+            self.widget = tk.Text(self.frame, height=4, width=40, wrap="word")
+            self.widget.insert("1.0", self.value)
+            self.widget.edit_modified(False)
+            panel.attach_text_menu(self.widget)
+        elif self.ftype == "checkbox":
+            self.var = tk.BooleanVar(value=bool(self.value))
+            self.widget = ttk.Checkbutton(self.frame, variable=self.var)
+        else:
+            self.var = tk.StringVar(value=self.value)
+            self.widget = ttk.Entry(self.frame, width=40, textvariable=self.var)
+            panel.attach_entry_menu(self.widget)
+            if panel.attach_suggest is not None:
+                panel.attach_suggest(self.widget, lambda: self.name)
+
+        sticky = "w" if self.ftype == "checkbox" else "we"
+        self.widget.grid(row=1, column=0, sticky=sticky, pady=(0, 8))
+        self.widget.form_row = self
+        self.widget.bindtags((ROW_TAG,) + self.widget.bindtags())
+        if self.var is not None:
+            panel.watch_var(self)
+
+    def _on_var_write(self, *args):
+        self.value = self.var.get()
+        self._changed()
+
+    def _on_text_modified(self, event=None):
+        if not self.widget.edit_modified():
+            return
+        self.widget.edit_modified(False)
+        self.value = self.widget.get("1.0", "end-1c")
+        self._changed()
+
+    def _changed(self):
+        if self.panel.on_change is not None:
+            self.panel.on_change(self.name, self.value)
+
+    def get_value(self):
+        if self.ftype == "checkbox":
+            return bool(self.value)
+        return self.value.strip()
+
+    def set_value(self, value):
+        if self.ftype == "checkbox":
+            value = bool(value)
+        else:
+            value = value or ""
+        self.value = value
+        if not self.realized:
+            return
+        if self.ftype == "multiline":
+            self.widget.delete("1.0", tk.END)
+            self.widget.insert("1.0", value)
+        else:
+            self.var.set(value)
+
+    def set_label(self, label: str):
+        self.label_text = label
+        if self.realized:
+            self.label.config(text=label)
+
+    def destroy(self):
+        if self.var is not None:
+            self.panel.unwatch_var(self)
+        if self.frame is not None:
+            self.frame.destroy()
+            self.frame = self.label = self.widget = self.var = None
+
+
+def _bind_row_class(widget):
+    # привязки класса общие для всего приложения — ставятся один раз
+    root = widget._root()
+    if getattr(root, "_form_row_bound", False):
+        return
+    root._form_row_bound = True
+    root.bind_class(ROW_TAG, "<FocusIn>", _on_row_focus)
+    root.bind_class(ROW_TAG, "<<Modified>>", _on_row_modified)
+
+
+def _on_row_focus(event):
+    # Tab в следующее поле докручивает форму до него
+    row = getattr(event.widget, "form_row", None)
+    if row is not None and row.panel is not None:
+        row.panel.see_row(row)
+
+
+def _on_row_modified(event):
+    row = getattr(event.widget, "form_row", None)
+    if row is not None and row.ftype == "multiline":
+        row._on_text_modified()
+
+
+# Форма одного шаблона полей: прокручиваемый холст, на котором строки
+# раскладываются по вычисленным координатам. Виджеты (и их контекстные
+# меню) создаются, только когда строка подходит к видимой области, поэтому
+# шаблон на тысячи полей открывается так же быстро, как на десяток.
+# sync() сверяет список полей с уже созданными строками по внутреннему
+# имени и трогает только то, что изменилось, — значения сохраняются.
+class FormPanel(ttk.Frame):
+    def __init__(self, parent, attach_entry_menu, attach_text_menu, on_change=None, attach_suggest=None):
+        super().__init__(parent)
+        self.attach_entry_menu = attach_entry_menu
+        self.attach_text_menu = attach_text_menu
+        # подключает подсказки к однострочному полю: (виджет, функция имени поля)
+        self.attach_suggest = attach_suggest
+        # вызывается при каждой правке поля пользователем: (имя, значение)
+        self.on_change = on_change
+        self.rows = {}
+        self.order = []
+        self._tops = []
+        self._total_height = 0
+        self._heights = dict(ESTIMATED_HEIGHTS)
+        self._measured = set()
+        self._realize_pending = False
+        # одна команда Tcl на все переменные полей: имя переменной -> строка
+        self._var_rows = {}
+        self._var_trace = self.register(self._on_var_trace)
+        _bind_row_class(self)
+
+        self.canvas = tk.Canvas(self, highlightthickness=0, borderwidth=0)
+        self.scroll = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_canvas_yscroll)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scroll.pack(side="right", fill="y")
+
+        self.inner = ttk.Frame(self.canvas)
+        self._inner_id = self.canvas.create_window(0, 0, window=self.inner, anchor="nw")
+
+        self.canvas.bind("<Configure>", self._on_canvas_configure)
+        # колесо мыши работает, пока указатель над формой
+        self.bind("<Enter>", self._bind_wheel)
+        self.bind("<Leave>", self._unbind_wheel)
+
+    # --- модель значений ---
+
+    def get_values(self, fields: list[dict]) -> dict:
+        data = {}
+        for f in fields:
+            row = self.rows.get(f.get("name"))
+            if row is not None:
+                data[row.name] = row.get_value()
+        return data
+
+    def set_values(self, values: dict):
+        for name, value in values.items():
+            row = self.rows.get(name)
+            if row is not None:
+                row.set_value(value)
+
+    def fill_empty(self, values: dict) -> int:
+        # заполняет только пустые поля; возвращает, сколько заполнено
+        filled = 0
+        for name, value in values.items():
+            row = self.rows.get(name)
+            if row is None or row.get_value() not in ("", False):
+                continue
+            row.set_value(value)
+            if not row.realized and self.on_change is not None:
+                # у созданного виджета правку увидит его обработчик
+                self.on_change(name, row.value)
+            filled += 1
+        return filled
+
+    # --- сверка со списком полей ---
+
+    def sync(self, fields: list[dict], renamed: dict | None = None):
+        for old, new in (renamed or {}).items():
+            if old in self.rows and new not in self.rows:
+                row = self.rows.pop(old)
+                row.name = new
+                self.rows[new] = row
+
+        wanted = {f.get("name") for f in fields}
+        for name in [n for n in self.rows if n not in wanted]:
+            self.rows.pop(name).destroy()
+
+        order = []
+        for f in fields:
+            name = f.get("name")
+            ftype = f.get("type", "text")
+            label = f.get("label", name or "?")
+
+            row = self.rows.get(name)
+            if row is not None and row.ftype != ftype:
+                # текст переносится между однострочным и многострочным полем
+                value = None
+                if {row.ftype, ftype} == {"text", "multiline"}:
+                    value = row.value
+                row.destroy()
+                row = None
+                self.rows[name] = FormRow(name, label, ftype, value)
+            elif row is None:
+                self.rows[name] = FormRow(name, label, ftype)
+            elif row.label_text != label:
+                row.set_label(label)
+            order.append(self.rows[name])
+
+        self.order = order
+        self._layout()
+        self._schedule_realize()
+
+    # --- отслеживание правок ---
+
+    def watch_var(self, row: FormRow):
+        name = str(row.var)
+        self._var_rows[name] = row
+        self.tk.call("trace", "add", "variable", name, "write", self._var_trace)
+
+    def unwatch_var(self, row: FormRow):
+        name = str(row.var)
+        if self._var_rows.pop(name, None) is not None:
+            self.tk.call("trace", "remove", "variable", name, "write", self._var_trace)
+
+    def _on_var_trace(self, name, index, op):
+        row = self._var_rows.get(name)
+        if row is not None:
+            row._on_var_write()
+
+    # --- раскладка и ленивое создание виджетов ---
+
+    def _layout(self):
+        tops = []
+        y = 0
+        for row in self.order:
+            tops.append(y)
+            if row.top != y and row.realized:
+                row.frame.place_configure(y=y)
+            row.top = y
+            y += self._heights[row.ftype]
+        self._tops = tops
+        self._total_height = y
+        self.inner.configure(height=y)
+        self.canvas.configure(scrollregion=(0, 0, 0, y))
+
+    def _schedule_realize(self):
+        if not self._realize_pending:
+            self._realize_pending = True
+            self.after_idle(self._realize_visible)
+
+    def _realize_visible(self):
+        self._realize_pending = False
+        if not self.order:
+            return
+        height = max(self.canvas.winfo_height(), 1)
+        top = self.canvas.canvasy(0) - height * REALIZE_MARGIN_SCREENS
+        bottom = self.canvas.canvasy(0) + height * (1 + REALIZE_MARGIN_SCREENS)
+
+        first = max(0, bisect.bisect_right(self._tops, top) - 1)
+        last = bisect.bisect_left(self._tops, bottom)
+        created = []
+        for row in self.order[first:last]:
+            if not row.realized:
+                row.realize(self)
+                row.frame.place(x=0, y=row.top, relwidth=1)
+                created.append(row)
+
+        if created and self._measure(created):
+            # оценка высоты оказалась неточной — раскладываем заново
+            # и досоздаём то, что теперь попало в видимую область
+            self._layout()
+            self._schedule_realize()
+
+    def _measure(self, rows: list[FormRow]) -> bool:
+        fresh = [r for r in rows if r.ftype not in self._measured]
+        if not fresh:
+            return False
+        self.inner.update_idletasks()
+        changed = False
+        for row in fresh:
+            if row.ftype in self._measured:
+                continue
+            self._measured.add(row.ftype)
+            height = row.frame.winfo_reqheight()
+            if height > 1 and height != self._heights[row.ftype]:
+                self._heights[row.ftype] = height
+                changed = True
+        return changed
+
+    def see_row(self, row: FormRow):
+        if not self._total_height:
+            return
+        view_top = self.canvas.canvasy(0)
+        view_bottom = view_top + self.canvas.winfo_height()
+        row_bottom = row.top + self._heights[row.ftype]
+        if row.top < view_top:
+            self.canvas.yview_moveto(row.top / self._total_height)
+        elif row_bottom > view_bottom:
+            target = row_bottom - self.canvas.winfo_height()
+            self.canvas.yview_moveto(max(0, target) / self._total_height)
+
+    def _on_canvas_configure(self, event):
+        self.canvas.itemconfigure(self._inner_id, width=event.width)
+        self._schedule_realize()
+
+    def _on_canvas_yscroll(self, first, last):
+        self.scroll.set(first, last)
+        self._schedule_realize()
+
+    # --- колесо мыши ---
+
+    def _bind_wheel(self, event=None):
+        self.bind_all("<MouseWheel>", self._on_wheel)
+        self.bind_all("<Button-4>", self._on_wheel)
+        self.bind_all("<Button-5>", self._on_wheel)
+
+    def _unbind_wheel(self, event=None):
+        # <Leave> приходит и при переходе указателя на дочерний виджет
+        if event is not None:
+            inside = self.winfo_containing(event.x_root, event.y_root)
+            if inside is not None and str(inside).startswith(str(self)):
+                return
+        self.unbind_all("<MouseWheel>")
+        self.unbind_all("<Button-4>")
+        self.unbind_all("<Button-5>")
+
+    def _on_wheel(self, event):
+        # многострочные поля прокручиваются сами
+        if isinstance(event.widget, tk.Text):
+            return
+        if event.num == 4:
+            step = -1
+        elif event.num == 5:
+            step = 1
+        else:
+            step = -1 if event.delta > 0 else 1
+        self.canvas.yview_scroll(step * 3, "units")
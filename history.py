@@ -0,0 +1,188 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from config import SETTINGS, STORAGE_DIR, log
+
+HISTORY_DB = os.path.join(STORAGE_DIR, "history.sqlite3")
+MAX_VALUE_LEN = 500
+# через сколько дней вес неиспользуемого значения падает вдвое
+HALF_LIFE_DAYS = 30
+# сколько совпадений по индексу ранжируется в памяти; если их больше,
+# значения перебираются сразу в порядке веса и перебор быстро кончается
+CANDIDATES = 2000
+
+_HALF_LIFE_S = HALF_LIFE_DAYS * 86400.0
+
+# Вес значения — частота, затухающая вдвое за HALF_LIFE_DAYS. Хранится
+# логарифм веса, приведённый к общей точке отсчёта (rank): порядок значений
+# от времени не зависит, поэтому по rank строится обычный индекс.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS field_history (
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    norm TEXT NOT NULL,
+    rank REAL NOT NULL,
+    PRIMARY KEY (field, value)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS field_history_prefix ON field_history (field, norm);
+CREATE INDEX IF NOT EXISTS field_history_rank ON field_history (field, rank);
+-- хвосты значения с начала каждого слова, кроме первого: «ромашка 462»
+-- для «ООО Ромашка 462»
+CREATE TABLE IF NOT EXISTS field_tails (
+    field TEXT NOT NULL,
+    tail TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (field, tail, value)
+) WITHOUT ROWID;
+"""
+
+
+def _norm(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _tails(norm: str) -> set[str]:
+    tails = set()
+    pos = norm.find(" ")
+    while pos >= 0:
+        tails.add(norm[pos + 1:])
+        pos = norm.find(" ", pos + 1)
+    return tails
+
+
+def _bump_rank(rank, now):
+    # ещё одно использование в момент now
+    t = now / _HALF_LIFE_S
+    if rank is None:
+        return t
+    # log2(2^(rank - t) + 1) + t без переполнения при больших разностях
+    return max(rank, t) + math.log2(1 + 2 ** -abs(rank - t))
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# История значений полей в SQLite: пополняется при сохранении отчёта,
+# подсказки берутся по началу значения или по началу любого его слова.
+# Сверх лимита на поле вытесняются значения с наименьшим весом.
+class ValueHistory:
+    def __init__(self, path: str = HISTORY_DB):
+        self.max_per_field = int(SETTINGS.get("history_max_per_field") or 0) or 20_000
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.create_function("bump_rank", 2, _bump_rank, deterministic=True)
+        self._db.executescript(_SCHEMA)
+
+    def record(self, values: dict[str, str]):
+        now = time.time()
+        rows = []
+        for field, value in values.items():
+            if not isinstance(value, str):
+                continue
+            value = value.strip()
+            if value and len(value) <= MAX_VALUE_LEN:
+                rows.append((field, value, _norm(value)))
+        if not rows:
+            return
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT INTO field_history (field, value, norm, rank) "
+                        "VALUES (?, ?, ?, bump_rank(NULL, ?4)) "
+                        "ON CONFLICT (field, value) DO UPDATE SET rank = bump_rank(rank, ?4)",
+                        [(field, value, norm, now) for field, value, norm in rows],
+                    )
+                    self._db.executemany(
+                        "INSERT OR IGNORE INTO field_tails (field, tail, value) VALUES (?, ?, ?)",
+                        [(field, tail, value) for field, value, norm in rows for tail in _tails(norm)],
+                    )
+                    for field in {r[0] for r in rows}:
+                        self._evict(field)
+            except sqlite3.Error:
+                # история — не повод ронять сохранение отчёта
+                log.exception("Не удалось записать историю значений")
+
+    def _evict(self, field: str):
+        (count,) = self._db.execute(
+            "SELECT COUNT(*) FROM field_history WHERE field = ?", (field,)
+        ).fetchone()
+        extra = count - self.max_per_field
+        if extra <= 0:
+            return
+        # с запасом, чтобы не вытеснять на каждом сохранении
+        extra += self.max_per_field // 10
+        victims = self._db.execute(
+            "SELECT value, norm FROM field_history WHERE field = ? ORDER BY rank LIMIT ?",
+            (field, extra),
+        ).fetchall()
+        self._delete(field, victims)
+
+    def _delete(self, field: str, values: list[tuple[str, str]]):
+        self._db.executemany(
+            "DELETE FROM field_history WHERE field = ? AND value = ?",
+            [(field, value) for value, _ in values],
+        )
+        self._db.executemany(
+            "DELETE FROM field_tails WHERE field = ? AND tail = ? AND value = ?",
+            [(field, tail, value) for value, norm in values for tail in _tails(norm)],
+        )
+
+    def suggest(self, field: str, text: str, limit: int = 8) -> list[str]:
+        norm = _norm(text)
+        if not norm:
+            return []
+        hi = norm + "\U0010ffff"
+        with self._lock:
+            try:
+                found = self._ranked(
+                    "SELECT value, rank FROM field_history "
+                    "WHERE field = ? AND norm >= ? AND norm < ? LIMIT ?",
+                    "SELECT value FROM field_history INDEXED BY field_history_rank "
+                    "WHERE field = ? AND norm >= ? AND norm < ? ORDER BY rank DESC LIMIT ?",
+                    (field, norm, hi), limit,
+                )
+                if len(found) < limit and len(norm) >= 2:
+                    # «ром» находит «ООО Ромашка»
+                    more = self._ranked(
+                        "SELECT h.value, h.rank FROM field_tails t "
+                        "JOIN field_history h ON h.field = t.field AND h.value = t.value "
+                        "WHERE t.field = ? AND t.tail >= ? AND t.tail < ? LIMIT ?",
+                        "SELECT value FROM field_history INDEXED BY field_history_rank "
+                        "WHERE field = ? AND ' ' || norm LIKE ? ESCAPE '\\' ORDER BY rank DESC LIMIT ?",
+                        (field, norm, hi), limit + len(found),
+                        slow_params=(field, "% " + _like_escape(norm) + "%"),
+                    )
+                    found += [v for v in more if v not in found][:limit - len(found)]
+            except sqlite3.Error:
+                log.exception("Не удалось получить подсказки")
+                return []
+        return found
+
+    def _ranked(self, by_index: str, by_rank: str, params: tuple, limit: int, slow_params=None) -> list[str]:
+        # совпадения по индексу, если их немного, сортируются в памяти;
+        # иначе их так много, что обход всех значений по убыванию веса
+        # наберёт limit почти сразу
+        rows = self._db.execute(by_index, params + (CANDIDATES,)).fetchall()
+        if len(rows) < CANDIDATES:
+            best = {}
+            for value, rank in rows:
+                best[value] = rank
+            return sorted(best, key=best.get, reverse=True)[:limit]
+        return [row[0] for row in self._db.execute(by_rank, (slow_params or params) + (limit,))]
+
+    def forget(self, field: str, value: str):
+        with self._lock:
+            try:
+                with self._db:
+                    self._delete(field, [(value, _norm(value))])
+            except sqlite3.Error:
+                log.exception("Не удалось удалить значение из истории")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
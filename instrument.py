@@ -0,0 +1,258 @@
+import collections
+import cProfile
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+from config import SETTINGS, STORAGE_DIR, log
+
+LOG_DIR = os.path.join(STORAGE_DIR, "logs")
+LOG_FILE = os.path.join(LOG_DIR, "docform.log")
+PROFILE_FILE = os.path.join(LOG_DIR, "last_slow.prof")
+LOG_BACKUPS = 3
+
+perf_log = logging.getLogger("docform.perf")
+
+# настройки читаются один раз: при выключенных замерах декораторы
+# возвращают функции как есть, а span() — общий пустой объект
+ENABLED = bool(SETTINGS.get("instrument_enabled"))
+PROFILE_SLOW_MS = int(SETTINGS.get("instrument_profile_slow_ms") or 0)
+
+_local = threading.local()
+# последние замеры верхнего уровня — для строки состояния
+_recent = collections.deque(maxlen=20)
+
+
+def setup_logging():
+    # ошибки и замеры пишутся в storage/logs/docform.log с ротацией
+    if any(isinstance(h, RotatingFileHandler) for h in log.handlers):
+        return
+    try:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        handler = RotatingFileHandler(
+            LOG_FILE,
+            maxBytes=max(int(SETTINGS.get("instrument_log_kb") or 0), 64) * 1024,
+            backupCount=LOG_BACKUPS,
+            encoding="utf-8",
+        )
+    except OSError:
+        return
+    handler.setFormatter(logging.Formatter("%(asctime)s\t%(levelname)s\t%(name)s\t%(message)s"))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+
+
+def _rss() -> int:
+    # занятая процессом память в байтах; 0, если узнать не удалось
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/statm", "rb") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            class Counters(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            counters = Counters()
+            counters.cb = ctypes.sizeof(counters)
+            ok = ctypes.windll.psapi.GetProcessMemoryInfo(
+                ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb
+            )
+            return counters.WorkingSetSize if ok else 0
+    except Exception:
+        pass
+    return 0
+
+
+def _stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+# Замер одной операции: длительность, размеры входа (страницы, листы,
+# поля, байты — добавляются через note()) и изменение занятой памяти.
+# Вложенные замеры пишутся отдельно, со своей глубиной.
+class Span:
+    __slots__ = ("name", "sizes", "depth", "started", "rss", "profiler")
+
+    def __init__(self, name: str, sizes: dict):
+        self.name = name
+        self.sizes = sizes
+        self.profiler = None
+
+    def __enter__(self):
+        stack = _stack()
+        self.depth = len(stack)
+        stack.append(self)
+        if PROFILE_SLOW_MS and self.depth == 0:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self.profiler = profiler
+            except ValueError:
+                # уже работает другой профилировщик
+                pass
+        self.rss = _rss()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.started) * 1000
+        if self.profiler is not None:
+            self.profiler.disable()
+        stack = _stack()
+        if self in stack:
+            stack.remove(self)
+
+        if exc_type is None:
+            status = "ok"
+        elif issubclass(exc_type, GeneratorExit) or exc_type.__name__ == "LoadCancelled":
+            status = "cancelled"
+        else:
+            status = "error"
+        rss = _rss()
+        record = {
+            "op": self.name,
+            "ms": round(ms, 1),
+            "mem_mb": round((rss - self.rss) / 2**20, 1) if rss and self.rss else None,
+            "status": status,
+            "depth": self.depth,
+            **self.sizes,
+        }
+        perf_log.info(json.dumps(record, ensure_ascii=False, default=str))
+        if self.depth == 0:
+            _recent.append(record)
+        if self.profiler is not None and ms >= PROFILE_SLOW_MS:
+            self._save_profile(ms)
+        return False
+
+    def _save_profile(self, ms: float):
+        try:
+            self.profiler.dump_stats(PROFILE_FILE)
+        except OSError:
+            return
+        log.info("Профиль медленной операции %s (%.0f мс): %s", self.name, ms, PROFILE_FILE)
+
+    def note(self, **sizes):
+        self.sizes.update(sizes)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def note(self, **sizes):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **sizes):
+    if not ENABLED:
+        return _NULL_SPAN
+    return Span(name, sizes)
+
+
+def note(**sizes):
+    # дописать размеры во внутренний замер текущего потока
+    if not ENABLED:
+        return
+    stack = _stack()
+    if stack:
+        stack[-1].sizes.update(sizes)
+
+
+def _file_size(path) -> int | None:
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def _iter_span(name: str, iterator, sizes: dict):
+    # замер генератора: от первого куска до последнего (или до отмены)
+    with Span(name, sizes):
+        yield from iterator
+
+
+def traced(name: str):
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def traced_reader(name: str):
+    # для читалок-генераторов: первый аргумент — путь к файлу
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(path, *args, **kwargs):
+            sizes = {"bytes": _file_size(path), "ext": os.path.splitext(str(path))[1].lower()}
+            return _iter_span(name, fn(path, *args, **kwargs), sizes)
+
+        return wrapper
+
+    return decorate
+
+
+def take_recent() -> list[dict]:
+    records = []
+    while _recent:
+        try:
+            records.append(_recent.popleft())
+        except IndexError:
+            break
+    return records
+
+
+def format_record(record: dict) -> str:
+    text = f"{record['op']}: {record['ms']:.0f} мс"
+    details = [
+        f"{key} {value}"
+        for key, value in record.items()
+        if key not in ("op", "ms", "mem_mb", "status", "depth", "ext") and value is not None
+    ]
+    if record.get("mem_mb"):
+        details.append(f"{record['mem_mb']:+.1f} МБ")
+    if record["status"] != "ok":
+        details.append({"cancelled": "отменено", "error": "ошибка"}[record["status"]])
+    if details:
+        text += " (" + ", ".join(details) + ")"
+    return text
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+
+from config import SETTINGS, STORAGE_DIR, atomic_write_text, log
+
+JOURNAL_FILE = os.path.join(STORAGE_DIR, "drafts.journal")
+
+
+def _empty(value) -> bool:
+    return value is False or value == "" or value is None
+
+
+def read_journal(path: str = JOURNAL_FILE) -> dict[str, dict]:
+    # шаблон -> {поле: значение}. Запись {"p", "f", "v"} — правка поля,
+    # {"p", "clear": true} — черновик шаблона больше не нужен.
+    # Оборванная при сбое последняя строка просто пропускается.
+    drafts = {}
+    try:
+        f = open(path, "r", encoding="utf-8")
+    except OSError:
+        return drafts
+    with f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+                profile = rec["p"]
+            except (ValueError, KeyError, TypeError):
+                continue
+            if rec.get("clear"):
+                drafts.pop(profile, None)
+                continue
+            values = drafts.setdefault(profile, {})
+            if _empty(rec.get("v")):
+                values.pop(rec.get("f"), None)
+            else:
+                values[rec.get("f")] = rec["v"]
+    return {p: v for p, v in drafts.items() if v}
+
+
+# Журнал черновиков формы. record() вызывается на каждую правку поля и
+# только кладёт значение в словарь под замком; запись на диск — пачкой
+# в фоновом потоке, из пачки правок одного поля пишется последняя.
+# Когда журнал разрастается, он переписывается снимком текущих черновиков.
+class DraftJournal:
+    def __init__(self, path: str = JOURNAL_FILE):
+        self.path = path
+        self.flush_s = max(int(SETTINGS.get("journal_flush_ms") or 0), 0) / 1000
+        self.compact_bytes = max(int(SETTINGS.get("journal_compact_kb") or 0), 1) * 1024
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._now = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._pending = {}
+        # что сейчас записано в журнал — для сжатия
+        self._state = read_journal(path)
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def drafts(self) -> dict[str, dict]:
+        with self._lock:
+            return {p: dict(v) for p, v in self._state.items()}
+
+    def record(self, profile: str, field: str, value):
+        with self._lock:
+            self._pending[(profile, field)] = value
+            self._idle.clear()
+        self._wake.set()
+
+    def clear(self, profile: str):
+        with self._lock:
+            for key in [k for k in self._pending if k[0] == profile]:
+                del self._pending[key]
+            self._pending[(profile, None)] = None
+            self._idle.clear()
+        self._wake.set()
+
+    def discard_all(self):
+        with self._lock:
+            self._pending.clear()
+            for profile in self._state:
+                self._pending[(profile, None)] = None
+            self._idle.clear()
+        self._wake.set()
+
+    def flush(self, timeout: float | None = None):
+        self._now.set()
+        self._wake.set()
+        self._idle.wait(timeout)
+
+    def _work(self):
+        while True:
+            self._wake.wait()
+            # даём правкам накопиться, чтобы писать пачкой
+            self._now.wait(self.flush_s)
+            self._wake.clear()
+            self._now.clear()
+            with self._lock:
+                batch = self._pending
+                self._pending = {}
+            if batch:
+                try:
+                    self._write(batch)
+                    self.last_error = None
+                except Exception as e:
+                    log.exception("Не удалось записать журнал черновиков")
+                    self.last_error = e
+            with self._lock:
+                if not self._pending:
+                    self._idle.set()
+
+    def _write(self, batch: dict):
+        lines = []
+        # _state читают drafts() и discard_all() из потока окна
+        with self._lock:
+            for (profile, field), value in batch.items():
+                if field is None:
+                    self._state.pop(profile, None)
+                    lines.append({"p": profile, "clear": True})
+                    continue
+                values = self._state.setdefault(profile, {})
+                if _empty(value):
+                    values.pop(field, None)
+                    if not values:
+                        del self._state[profile]
+                else:
+                    values[field] = value
+                lines.append({"p": profile, "f": field, "v": value})
+
+        text = "".join(json.dumps(rec, ensure_ascii=False) + "\n" for rec in lines)
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+
+        if size + len(text) > self.compact_bytes:
+            self._compact()
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self):
+        with self._lock:
+            state = [(p, list(v.items())) for p, v in self._state.items()]
+        snapshot = []
+        for profile, values in state:
+            for field, value in values:
+                snapshot.append(json.dumps({"p": profile, "f": field, "v": value}, ensure_ascii=False) + "\n")
+        atomic_write_text(self.path, "".join(snapshot))
@@ -0,0 +1,114 @@
+import queue
+import threading
+
+from readers import LoadCancelled
+
+
+# Читает документ в фоновом потоке и отдаёт его в Tk кусками через after():
+# первая страница появляется сразу, не дожидаясь конца документа.
+# Каждой загрузке присваивается номер поколения: сообщения от отменённой
+# или устаревшей загрузки (пользователь уже открыл другой файл) отбрасываются.
+# on_delivered(куски) узнаёт, какие именно куски дошли до окна.
+class DocumentLoader:
+    POLL_MS = 50
+
+    def __init__(self, widget, on_chunk, on_progress, on_done, on_error, on_delivered=None):
+        self.widget = widget
+        self.on_chunk = on_chunk
+        self.on_delivered = on_delivered
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+
+        self._queue = queue.Queue()
+        self._generation = 0
+        self._cancel_event = None
+        self._polling = False
+
+    @property
+    def busy(self) -> bool:
+        return self._cancel_event is not None
+
+    def load(self, source):
+        # source(progress) возвращает итератор кусков текста
+        self.cancel()
+        self._generation += 1
+        self._cancel_event = threading.Event()
+
+        worker = threading.Thread(
+            target=self._work,
+            args=(self._generation, source, self._cancel_event),
+            daemon=True,
+        )
+        worker.start()
+
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.POLL_MS, self._poll)
+
+    def cancel(self):
+        if self._cancel_event is None:
+            return
+        self._cancel_event.set()
+        self._cancel_event = None
+        # всё, что ещё придёт от прерванного потока, станет устаревшим
+        self._generation += 1
+
+    def _work(self, generation, source, cancel_event):
+        def progress(done, total):
+            if cancel_event.is_set():
+                raise LoadCancelled()
+            self._queue.put((generation, "progress", (done, total)))
+
+        try:
+            for chunk in source(progress):
+                if cancel_event.is_set():
+                    return
+                self._queue.put((generation, "chunk", chunk))
+        except LoadCancelled:
+            return
+        except Exception as e:
+            self._queue.put((generation, "error", e))
+            return
+        self._queue.put((generation, "done", None))
+
+    def _poll(self):
+        last_progress = None
+        finished = None
+        chunks = []
+        while True:
+            try:
+                generation, kind, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self._generation:
+                continue
+            if kind == "chunk":
+                chunks.append(payload)
+            elif kind == "progress":
+                last_progress = payload
+            else:
+                finished = (kind, payload)
+
+        # всё пришедшее за один тик вставляем одним вызовом
+        if chunks:
+            self.on_chunk("".join(chunks))
+            if self.on_delivered is not None:
+                self.on_delivered(chunks)
+
+        # из пачки промежуточных отметок показываем только последнюю
+        if last_progress is not None and finished is None:
+            self.on_progress(*last_progress)
+
+        if finished is not None:
+            self._cancel_event = None
+            kind, payload = finished
+            if kind == "done":
+                self.on_done()
+            else:
+                self.on_error(payload)
+
+        if self.busy:
+            self.widget.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
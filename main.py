@@ -1,126 +1,50 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import json
+import multiprocessing
 import os
 import copy
+import queue
 import shutil
 import re
-
-import pdfplumber
-from docx import Document
-import pandas as pd
-
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-STORAGE_DIR = os.path.join(BASE_DIR, "storage")
-os.makedirs(STORAGE_DIR, exist_ok=True)
-
-CONFIG_FILE = os.path.join(STORAGE_DIR, "fields_config.json")
-
-DEFAULT_PROFILE_NAME = "default"
-
-DEFAULT_FIELDS = [
-    {
-        "name": "NAME",
-        "label": "ФИО",
-        "type": "text",
-    },
-    {
-        "name": "ORGANIZATION",
-        "label": "Организация",
-        "type": "text",
-    },
-    {
-        "name": "COMMENT",
-        "label": "Комментарий",
-        "type": "multiline",
-    },
-]
-
-
-def default_config():
-    return {
-        "current_profile": DEFAULT_PROFILE_NAME,
-        "profiles": {
-            DEFAULT_PROFILE_NAME: {
-                "fields": copy.deepcopy(DEFAULT_FIELDS),
-                "template_path": None,
-            }
-        },
-    }
-
-
-def load_config():
-    if not os.path.exists(CONFIG_FILE):
-        return default_config()
-
-    try:
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception:
-        return default_config()
-
-    if isinstance(data, list):
-        return {
-            "current_profile": DEFAULT_PROFILE_NAME,
-            "profiles": {
-                DEFAULT_PROFILE_NAME: {
-                    "fields": data,
-                    "template_path": None,
-                }
-            },
-        }
-
-    if isinstance(data, dict) and "fields" in data and "profiles" not in data:
-        return {
-            "current_profile": DEFAULT_PROFILE_NAME,
-            "profiles": {
-                DEFAULT_PROFILE_NAME: {
-                    "fields": data.get("fields", copy.deepcopy(DEFAULT_FIELDS)),
-                    # тут может быть абсолютный путь старого формата
-                    "template_path": data.get("template_path"),
-                }
-            },
-        }
-
-    if isinstance(data, dict) and "profiles" in data:
-        profiles = data.get("profiles") or {}
-        if not profiles:
-            return default_config()
-
-        current = data.get("current_profile") or list(profiles.keys())[0]
-        if current not in profiles:
-            current = list(profiles.keys())[0]
-
-        for name, prof in list(profiles.items()):
-            if not isinstance(prof, dict):
-                profiles[name] = {
-                    "fields": copy.deepcopy(DEFAULT_FIELDS),
-                    "template_path": None,
-                }
-                continue
-            if "fields" not in prof:
-                prof["fields"] = copy.deepcopy(DEFAULT_FIELDS)
-            if "template_path" not in prof:
-                prof["template_path"] = None
-
-        return {
-            "current_profile": current,
-            "profiles": profiles,
-        }
-
-    return default_config()
-
-
-def save_config(profiles, current_profile):
-    try:
-        data = {
-            "current_profile": current_profile,
-            "profiles": profiles,
-        }
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print("Не удалось сохранить конфиг:", e)
+import tempfile
+import threading
+import time
+
+from archive import MAX_RESULTS as MAX_ARCHIVE_RESULTS, ReportArchive
+from autocomplete import SuggestionPopup
+from batch import read_rows, run_batch
+from cache import TextCache
+from config import SETTINGS, STORAGE_DIR, ConfigWriter, load_config, template_abs_path
+from convert import get_converter_pool
+from extract import ExtractRunner, rule_error
+from form import FormPanel
+from history import ValueHistory
+from instrument import format_record, note, setup_logging, span, take_recent, traced
+from journal import DraftJournal
+from loader import DocumentLoader
+from readers import ExcelWorkbook, excel_rows_per_load, iter_any_file
+from render import (
+    CompiledTemplate,
+    build_placeholders,
+    build_plain_report,
+    compile_template,
+    default_report_name,
+    remove_template_index,
+)
+from search import IndexBuilder
+from startup import measure_first_frame
+from viewer import DocumentView
+
+CONFIG_SAVE_DELAY_MS = 400
+REPORT_POLL_MS = 100
+PERF_POLL_MS = 500
+ARCHIVE_SEARCH_DELAY_MS = 100
+# этапы сохранения отчёта: шаблон, подстановка, запись, конвертация в PDF
+REPORT_STEPS = 4
+
+# теги привязок для полей ввода с общим контекстным меню
+ENTRY_MENU_TAG = "DocFormEntry"
+TEXT_MENU_TAG = "DocFormText"
 
 
 class FileFormApp(tk.Tk):
@@ -135,11 +59,66 @@ class FileFormApp(tk.Tk):
         cfg = load_config()
         self.profiles = cfg["profiles"]
         self.current_profile = cfg["current_profile"]
-
-        self.field_widgets = {}
-        self.checkbox_vars = {}
+        self.config_writer = ConfigWriter()
+        self._config_after_id = None
+        self._shown_config_error = None
+
+        self.form_panels = {}
+        # восстановленные черновики шаблонов, чьи формы ещё не создавались
+        self._drafts = {}
+        self.journal = DraftJournal()
+        self.history = ValueHistory() if SETTINGS.get("history_enabled") else None
+        self.suggest_popup = SuggestionPopup(self, self.history) if self.history is not None else None
+        self.archive = ReportArchive() if SETTINGS.get("archive_enabled") else None
+        self._shown_form_panel = None
+        self.loader = DocumentLoader(
+            self,
+            on_chunk=self._on_load_chunk,
+            on_delivered=self._on_load_delivered,
+            on_progress=self._on_load_progress,
+            on_done=self._on_load_done,
+            on_error=self._on_load_error,
+        )
+        self.excel = None
+        self.search_builder = IndexBuilder(self, on_ready=self._on_search_index_ready)
+        self.extract_runner = ExtractRunner(self, on_ready=self._on_extract_ready)
+        self.search_index = None
+        self.search_hits = []
+        self.search_pos = -1
+        self._search_after_id = None
+        self._reindex_after_id = None
+        self._report_thread = None
+        self._report_events = queue.Queue()
+        self._init_edit_menus()
         self._build_ui()
         self._load_profile_into_ui()
+        measure_first_frame(self)
+        self.after_idle(self._offer_draft_restore)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def _offer_draft_restore(self):
+        drafts = {p: v for p, v in self.journal.drafts().items() if p in self.profiles}
+        if not drafts:
+            return
+        names = ", ".join(drafts)
+        if not messagebox.askyesno(
+            "Несохранённые данные",
+            f"Найдены данные формы, не попавшие в отчёт (шаблоны: {names}).\n"
+            "Восстановить их?",
+        ):
+            self.journal.discard_all()
+            return
+
+        self._drafts = drafts
+        for profile, panel in self.form_panels.items():
+            if profile in self._drafts:
+                panel.set_values(self._drafts.pop(profile))
+
+    def _poll_perf_status(self):
+        records = take_recent()
+        if records:
+            self.perf_status.config(text=format_record(records[-1]))
+        self.after(PERF_POLL_MS, self._poll_perf_status)
 
     def _get_profile(self, name=None):
         if name is None:
@@ -147,16 +126,57 @@ class FileFormApp(tk.Tk):
         return self.profiles[name]
 
     def _save_all_config(self):
-        save_config(self.profiles, self.current_profile)
-
-    def _get_template_abs_path(self, template_path: str | None) -> str | None:
-        if not template_path:
-            return None
-        if os.path.isabs(template_path):
-            return template_path
-        return os.path.join(STORAGE_DIR, template_path)
+        # частые правки (перемещение полей и т.п.) сливаются в одну запись
+        if self._config_after_id is not None:
+            self.after_cancel(self._config_after_id)
+        self._config_after_id = self.after(CONFIG_SAVE_DELAY_MS, self._flush_config)
+
+    def _flush_config(self):
+        self._config_after_id = None
+        self.config_writer.submit(self.profiles, self.current_profile)
+        self.after(1000, self._check_config_error)
+
+    def _check_config_error(self):
+        error = self.config_writer.last_error
+        if error is None or error is self._shown_config_error:
+            return
+        self._shown_config_error = error
+        messagebox.showerror("Ошибка", f"Не удалось сохранить шаблоны полей:\n{error}")
+
+    def on_close(self):
+        if self._config_after_id is not None:
+            self.after_cancel(self._config_after_id)
+            self._flush_config()
+        self.config_writer.flush()
+        self.journal.flush(timeout=5)
+        if self._report_thread is not None:
+            # не бросаем недописанный файл отчёта
+            self._report_thread.join()
+        if self.history is not None:
+            self.history.close()
+        if self.archive is not None:
+            self.archive.close()
+        self.destroy()
 
     def _build_ui(self):
+        menubar = tk.Menu(self)
+        service_menu = tk.Menu(menubar, tearoff=0)
+        service_menu.add_command(label="Пакетная генерация отчётов...", command=self.open_batch_dialog)
+        service_menu.add_command(label="Заполнить поля из документа", command=self.extract_fields)
+        if self.archive is not None:
+            service_menu.add_command(label="Архив отчётов...", command=self.open_archive_dialog)
+        service_menu.add_separator()
+        service_menu.add_command(label="Очистить кэш документов", command=self.clear_text_cache)
+        menubar.add_cascade(label="Сервис", menu=service_menu)
+        self.config(menu=menubar)
+
+        self.perf_status = None
+        if SETTINGS.get("instrument_status_bar"):
+            # строка состояния пакуется первой, чтобы всегда оставаться внизу
+            self.perf_status = ttk.Label(self, text="", anchor="w", relief="sunken")
+            self.perf_status.pack(side="bottom", fill="x")
+            self.after(PERF_POLL_MS, self._poll_perf_status)
+
         main = ttk.Frame(self)
         main.pack(fill="both", expand=True, padx=10, pady=10)
 
@@ -175,15 +195,38 @@ class FileFormApp(tk.Tk):
         self.file_label = ttk.Label(top_left, text="Файл не выбран")
         self.file_label.pack(side="left", padx=10)
 
+        self.load_cancel_btn = ttk.Button(
+            top_left, text="Отмена", command=self.cancel_loading
+        )
+        self.load_progress = ttk.Progressbar(top_left, length=150, mode="determinate")
+        self.load_status = ttk.Label(top_left, text="")
+
+        # панель листов Excel — показывается только для книг Excel
+        self.excel_bar = ttk.Frame(left)
+        ttk.Label(self.excel_bar, text="Лист:").pack(side="left")
+        self.sheet_combo = ttk.Combobox(self.excel_bar, state="readonly", width=30)
+        self.sheet_combo.pack(side="left", padx=5)
+        self.sheet_combo.bind("<<ComboboxSelected>>", self.on_sheet_change)
+        self.more_rows_btn = ttk.Button(
+            self.excel_bar, text="Загрузить ещё", command=self.load_more_rows
+        )
+        self.more_rows_btn.pack(side="left", padx=(5, 0))
+        self.excel_status = ttk.Label(self.excel_bar, text="")
+        self.excel_status.pack(side="left", padx=10)
+        self._top_left = top_left
+
+        self._build_search_bar(left)
+
         text_frame = ttk.Frame(left)
         text_frame.pack(fill="both", expand=True, pady=(10, 0))
 
-        self.text = tk.Text(text_frame, wrap="word")
-        scroll = ttk.Scrollbar(text_frame, command=self.text.yview)
-        self.text.configure(yscrollcommand=scroll.set)
-
-        self.text.pack(side="left", fill="both", expand=True)
-        scroll.pack(side="right", fill="y")
+        self.viewer = DocumentView(text_frame)
+        self.viewer.on_modified = self._schedule_search_reindex
+        self.text = self.viewer.text
+        # найденные правилами значения; теги поиска созданы позже и рисуются поверх
+        self.text.tag_configure("extract_hit", background="#c8e6c9")
+        self.text.tag_configure("search_hit", background="#fff59d")
+        self.text.tag_configure("search_current", background="#ffb74d")
 
         self._init_text_context_menu()
 
@@ -229,14 +272,38 @@ class FileFormApp(tk.Tk):
         )
         template_btn.pack(side="right", padx=(5, 10))
 
-        self.form_frame = ttk.Frame(right)
-        self.form_frame.pack(fill="both", expand=True, pady=(5, 0))
-
+        # кнопка пакуется раньше формы, чтобы длинная форма её не вытеснила
         btn_frame = ttk.Frame(right)
-        btn_frame.pack(fill="x", pady=10)
+        btn_frame.pack(side="bottom", fill="x", pady=10)
 
-        report_btn = ttk.Button(btn_frame, text="Сохранить отчёт", command=self.save_report)
-        report_btn.pack(fill="x")
+        self.form_container = ttk.Frame(right)
+        self.form_container.pack(fill="both", expand=True, pady=(5, 0))
+
+        self.report_status = ttk.Label(btn_frame, text="")
+        self.report_progress = ttk.Progressbar(btn_frame, mode="determinate")
+        self.report_btn = ttk.Button(btn_frame, text="Сохранить отчёт", command=self.save_report)
+        self.report_btn.pack(fill="x")
+
+    def _build_search_bar(self, parent):
+        bar = ttk.Frame(parent)
+        bar.pack(fill="x", pady=(10, 0))
+
+        ttk.Label(bar, text="Поиск:").pack(side="left")
+        self.search_entry = ttk.Entry(bar, width=30)
+        self.search_entry.pack(side="left", padx=5)
+        self._attach_entry_context_menu(self.search_entry)
+
+        ttk.Button(bar, text="▲", width=3, command=self.search_prev).pack(side="left")
+        ttk.Button(bar, text="▼", width=3, command=self.search_next).pack(side="left", padx=(2, 0))
+
+        self.search_status = ttk.Label(bar, text="")
+        self.search_status.pack(side="left", padx=10)
+
+        self.search_entry.bind("<KeyRelease>", self._on_search_key)
+        self.search_entry.bind("<Return>", lambda e: self.search_next())
+        self.search_entry.bind("<Shift-Return>", lambda e: self.search_prev())
+        self.search_entry.bind("<Escape>", lambda e: self._clear_search(reset_entry=True))
+        self.bind("<Control-f>", self._focus_search)
 
     def _load_profile_into_ui(self):
         profile = self._get_profile()
@@ -256,6 +323,7 @@ class FileFormApp(tk.Tk):
         self.text.bind("<Button-3>", self._show_text_menu)
         self.text.bind("<Control-c>", self._on_ctrl_c_text)
         self.text.bind("<Control-v>", self._on_ctrl_v_text)
+        self.text.bind("<Control-a>", self._on_ctrl_a_text)
 
     def _show_text_menu(self, event):
         try:
@@ -264,9 +332,9 @@ class FileFormApp(tk.Tk):
             self.text_menu.grab_release()
 
     def copy_selection_text(self, event=None):
-        try:
-            selection = self.text.get("sel.first", "sel.last")
-        except tk.TclError:
+        # в оконном режиме выделение может выходить за показанный кусок
+        selection = self.viewer.get_selection()
+        if selection is None:
             return
         self.clipboard_clear()
         self.clipboard_append(selection)
@@ -286,22 +354,45 @@ class FileFormApp(tk.Tk):
         self.paste_into_text()
         return "break"
 
-    def _attach_entry_context_menu(self, widget: tk.Widget):
-        menu = tk.Menu(widget, tearoff=0)
-        menu.add_command(label="Вырезать", command=lambda: self._entry_cut(widget))
-        menu.add_command(label="Копировать", command=lambda: self._entry_copy(widget))
-        menu.add_command(label="Вставить", command=lambda: self._entry_paste(widget))
+    def _on_ctrl_a_text(self, event):
+        self.viewer.select_all()
+        return "break"
 
-        def show_menu(event):
-            try:
-                menu.tk_popup(event.x_root, event.y_root)
-            finally:
-                menu.grab_release()
+    def _init_edit_menus(self):
+        # одно меню и один набор привязок на класс виджетов: поля формы
+        # получают только тег в bindtags, а команды работают с виджетом,
+        # на котором открыли меню
+        self._menu_widget = None
+
+        self.entry_menu = tk.Menu(self, tearoff=0)
+        self.entry_menu.add_command(label="Вырезать", command=lambda: self._entry_cut(self._menu_widget))
+        self.entry_menu.add_command(label="Копировать", command=lambda: self._entry_copy(self._menu_widget))
+        self.entry_menu.add_command(label="Вставить", command=lambda: self._entry_paste(self._menu_widget))
+
+        self.field_text_menu = tk.Menu(self, tearoff=0)
+        self.field_text_menu.add_command(label="Вырезать", command=lambda: self._text_cut(self._menu_widget))
+        self.field_text_menu.add_command(label="Копировать", command=lambda: self._text_copy(self._menu_widget))
+        self.field_text_menu.add_command(label="Вставить", command=lambda: self._text_paste(self._menu_widget))
+
+        handlers = (
+            (ENTRY_MENU_TAG, self.entry_menu, self._entry_cut, self._entry_copy, self._entry_paste),
+            (TEXT_MENU_TAG, self.field_text_menu, self._text_cut, self._text_copy, self._text_paste),
+        )
+        for tag, menu, cut, copy_, paste in handlers:
+            self.bind_class(tag, "<Button-3>", lambda e, m=menu: self._show_edit_menu(e, m))
+            self.bind_class(tag, "<Control-c>", lambda e, f=copy_: (f(e.widget), "break")[1])
+            self.bind_class(tag, "<Control-v>", lambda e, f=paste: (f(e.widget), "break")[1])
+            self.bind_class(tag, "<Control-x>", lambda e, f=cut: (f(e.widget), "break")[1])
+
+    def _show_edit_menu(self, event, menu: tk.Menu):
+        self._menu_widget = event.widget
+        try:
+            menu.tk_popup(event.x_root, event.y_root)
+        finally:
+            menu.grab_release()
 
-        widget.bind("<Button-3>", show_menu)
-        widget.bind("<Control-c>", lambda e: (self._entry_copy(widget), "break"))
-        widget.bind("<Control-v>", lambda e: (self._entry_paste(widget), "break"))
-        widget.bind("<Control-x>", lambda e: (self._entry_cut(widget), "break"))
+    def _attach_entry_context_menu(self, widget: tk.Widget):
+        widget.bindtags((ENTRY_MENU_TAG,) + widget.bindtags())
 
     def _entry_copy(self, widget):
         try:
@@ -328,21 +419,7 @@ class FileFormApp(tk.Tk):
         widget.insert(tk.INSERT, data)
 
     def _attach_text_context_menu(self, widget: tk.Text):
-        menu = tk.Menu(widget, tearoff=0)
-        menu.add_command(label="Вырезать", command=lambda: self._text_cut(widget))
-        menu.add_command(label="Копировать", command=lambda: self._text_copy(widget))
-        menu.add_command(label="Вставить", command=lambda: self._text_paste(widget))
-
-        def show_menu(event):
-            try:
-                menu.tk_popup(event.x_root, event.y_root)
-            finally:
-                menu.grab_release()
-
-        widget.bind("<Button-3>", show_menu)
-        widget.bind("<Control-c>", lambda e: (self._text_copy(widget), "break"))
-        widget.bind("<Control-v>", lambda e: (self._text_paste(widget), "break"))
-        widget.bind("<Control-x>", lambda e: (self._text_cut(widget), "break"))
+        widget.bindtags((TEXT_MENU_TAG,) + widget.bindtags())
 
     def _text_copy(self, widget):
         try:
@@ -368,37 +445,30 @@ class FileFormApp(tk.Tk):
             return
         widget.insert(tk.INSERT, data)
 
-    def build_form(self):
-        for child in self.form_frame.winfo_children():
-            child.destroy()
-        self.field_widgets.clear()
-        self.checkbox_vars.clear()
-
-        for i, f in enumerate(self.fields):
-            label = ttk.Label(
-                self.form_frame, text=f.get("label", f.get("name", "?"))
+    @traced("build_form")
+    def build_form(self, renamed: dict | None = None):
+        # у каждого шаблона своя форма: при переключении она просто
+        # показывается снова, а при правке полей перестраивается только разница
+        note(fields=len(self.fields))
+        panel = self.form_panels.get(self.current_profile)
+        if panel is None:
+            panel = FormPanel(
+                self.form_container,
+                attach_entry_menu=self._attach_entry_context_menu,
+                attach_text_menu=self._attach_text_context_menu,
+                on_change=lambda name, value, p=self.current_profile: self.journal.record(p, name, value),
+                attach_suggest=self.suggest_popup.attach if self.suggest_popup is not None else None,
             )
-            label.grid(row=i * 2, column=0, sticky="w", pady=(0, 2))
-
-            ftype = f.get("type", "text")
-
-            if ftype == "multiline":
-                widget = tk.Text(self.form_frame, height=4, width=40, wrap="word")
-                widget.grid(row=i * 2 + 1, column=0, sticky="we", pady=(0, 8))
-                self._attach_text_context_menu(widget)
-            elif ftype == "checkbox":
-                var = tk.BooleanVar(value=False)
-                widget = ttk.Checkbutton(self.form_frame, variable=var)
-                widget.grid(row=i * 2 + 1, column=0, sticky="w", pady=(0, 8))
-                self.checkbox_vars[f["name"]] = var
-            else:
-                widget = ttk.Entry(self.form_frame, width=40)
-                widget.grid(row=i * 2 + 1, column=0, sticky="we", pady=(0, 8))
-                self._attach_entry_context_menu(widget)
+            self.form_panels[self.current_profile] = panel
+        panel.sync(self.fields, renamed)
+        if self.current_profile in self._drafts:
+            panel.set_values(self._drafts.pop(self.current_profile))
 
-            self.field_widgets[f["name"]] = widget
-
-        self.form_frame.columnconfigure(0, weight=1)
+        if self._shown_form_panel is not panel:
+            if self._shown_form_panel is not None:
+                self._shown_form_panel.pack_forget()
+            panel.pack(fill="both", expand=True)
+            self._shown_form_panel = panel
 
     def on_profile_change(self, event=None):
         new_profile = self.profile_combo.get()
@@ -411,6 +481,8 @@ class FileFormApp(tk.Tk):
         self.current_profile = new_profile
         self._save_all_config()
         self._load_profile_into_ui()
+        if not self.loader.busy:
+            self._run_extraction()
 
     def create_profile_from_current(self):
         from tkinter import simpledialog
@@ -457,7 +529,7 @@ class FileFormApp(tk.Tk):
             return
 
         prof = self._get_profile()
-        tmpl_abs = self._get_template_abs_path(prof.get("template_path"))
+        tmpl_abs = template_abs_path(prof.get("template_path"))
 
         if tmpl_abs and os.path.commonpath([tmpl_abs, STORAGE_DIR]) == STORAGE_DIR:
             if os.path.exists(tmpl_abs):
@@ -465,8 +537,15 @@ class FileFormApp(tk.Tk):
                     os.remove(tmpl_abs)
                 except OSError:
                     pass
+            remove_template_index(tmpl_abs)
 
         del self.profiles[self.current_profile]
+        self.journal.clear(self.current_profile)
+        self._drafts.pop(self.current_profile, None)
+        panel = self.form_panels.pop(self.current_profile, None)
+        if panel is not None:
+            panel.destroy()
+            self._shown_form_panel = None
 
         self.current_profile = list(self.profiles.keys())[0]
         self._save_all_config()
@@ -551,7 +630,10 @@ class FileFormApp(tk.Tk):
             self.fields[i] = updated
             self._get_profile()["fields"] = self.fields
             self._save_all_config()
-            self.build_form()
+            renamed = None
+            if field.get("name") != updated["name"]:
+                renamed = {field.get("name"): updated["name"]}
+            self.build_form(renamed)
             refresh_listbox(i)
 
         def delete_field():
@@ -617,9 +699,18 @@ class FileFormApp(tk.Tk):
         type_combo = ttk.Combobox(dialog, values=["text", "multiline", "checkbox"], state="readonly")
         type_combo.grid(row=5, column=0, sticky="we", padx=10)
 
+        ttk.Label(
+            dialog,
+            text="Правило заполнения из документа (необязательно):\n"
+            "слова-якоря через |, например «ИНН | ИНН/КПП», или re:регулярное выражение",
+        ).grid(row=6, column=0, sticky="w", padx=10, pady=(10, 2))
+        rule_entry = ttk.Entry(dialog, width=30)
+        rule_entry.grid(row=7, column=0, sticky="we", padx=10)
+
         if is_edit:
             name_entry.insert(0, field.get("name", ""))
             label_entry.insert(0, field.get("label", ""))
+            rule_entry.insert(0, field.get("rule", ""))
             ftype = field.get("type", "text")
             if ftype not in ("text", "multiline", "checkbox"):
                 ftype = "text"
@@ -633,6 +724,7 @@ class FileFormApp(tk.Tk):
             name = name_entry.get().strip().upper()
             label = label_entry.get().strip()
             ftype = (type_combo.get() or "text").strip()
+            rule = rule_entry.get().strip()
 
             if not name:
                 messagebox.showerror("Ошибка", "Имя поля не может быть пустым.", parent=dialog)
@@ -645,15 +737,22 @@ class FileFormApp(tk.Tk):
                     messagebox.showerror("Ошибка", "Поле с таким именем уже существует.", parent=dialog)
                     return
 
+            error = rule_error(rule)
+            if error:
+                messagebox.showerror("Ошибка", f"Ошибка в регулярном выражении:\n{error}", parent=dialog)
+                return
+
             result["value"] = {
                 "name": name,
                 "label": label or name,
                 "type": ftype,
             }
+            if rule:
+                result["value"]["rule"] = rule
             dialog.destroy()
 
         btn_frame = ttk.Frame(dialog)
-        btn_frame.grid(row=6, column=0, sticky="e", padx=10, pady=10)
+        btn_frame.grid(row=8, column=0, sticky="e", padx=10, pady=10)
 
         save_btn = ttk.Button(btn_frame, text="Сохранить", command=on_save)
         save_btn.pack(side="right", padx=(5, 0))
@@ -675,13 +774,14 @@ class FileFormApp(tk.Tk):
             return
 
         old_rel = self.template_path
-        old_abs = self._get_template_abs_path(old_rel)
+        old_abs = template_abs_path(old_rel)
         if old_abs and os.path.commonpath([old_abs, STORAGE_DIR]) == STORAGE_DIR:
             if os.path.exists(old_abs):
                 try:
                     os.remove(old_abs)
                 except OSError:
                     pass
+            remove_template_index(old_abs)
 
         safe_profile = re.sub(r"[^A-Za-z0-9_-]+", "_", self.current_profile)
         new_rel_name = f"{safe_profile}.docx"
@@ -693,6 +793,12 @@ class FileFormApp(tk.Tk):
             messagebox.showerror("Ошибка", f"Не удалось скопировать шаблон:\n{e}")
             return
 
+        try:
+            compile_template(new_abs)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось разобрать шаблон:\n{e}")
+            return
+
         self.template_path = new_rel_name
         self._get_profile()["template_path"] = new_rel_name
         self._save_all_config()
@@ -716,194 +822,618 @@ class FileFormApp(tk.Tk):
         self.current_file_path = file_path
         self.file_label.config(text=file_path)
 
-        self.text.config(state="normal")
-        self.text.delete("1.0", tk.END)
+        self.viewer.clear()
+        self.search_builder.cancel()
+        self.extract_runner.cancel()
+        self.search_index = None
+        self._clear_search()
 
-        try:
-            content = self.read_any_file(file_path)
-            self.text.insert(tk.END, content)
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось прочитать файл:\n{e}")
-
-    def read_any_file(self, path: str) -> str:
-        path_l = path.lower()
-        if path_l.endswith((".txt", ".log", ".md")):
-            return self.read_text(path)
-        if path_l.endswith(".pdf"):
-            return self.read_pdf(path)
-        if path_l.endswith((".doc", ".docx")):
-            return self.read_word(path)
-        if path_l.endswith((".xls", ".xlsx")):
-            return self.read_excel(path)
-        return "Формат файла не поддерживается."
-
-    @staticmethod
-    def read_text(path: str) -> str:
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            return f.read()
-
-    @staticmethod
-    def read_pdf(path: str) -> str:
-        text = ""
-        with pdfplumber.open(path) as pdf:
-            for page in pdf.pages:
-                text += (page.extract_text() or "") + "\n"
-        return text or "PDF не содержит распознаваемый текст (возможно, только картинки)."
-
-    @staticmethod
-    def read_word(path: str) -> str:
-        doc = Document(path)
-        return "\n".join(p.text for p in doc.paragraphs)
-
-    @staticmethod
-    def read_excel(path: str) -> str:
-        df_dict = pd.read_excel(path, sheet_name=None)
-        output = ""
-        for sheet_name, df in df_dict.items():
-            output += f"=== Лист: {sheet_name} ===\n"
-            output += df.to_string(index=False)
-            output += "\n\n"
-        return output
+        if self.excel is not None:
+            self.excel.close()
+            self.excel = None
 
-    def collect_form_data(self) -> dict:
-        data = {}
-        for f in self.fields:
-            name = f.get("name")
-            ftype = f.get("type", "text")
-            widget = self.field_widgets.get(name)
-            if not widget:
-                continue
+        if file_path.lower().endswith((".xls", ".xlsx")):
+            self.excel = ExcelWorkbook(file_path)
+            self._load_excel_rows(None)
+            return
 
-            if ftype == "multiline":
-                value = widget.get("1.0", tk.END).strip()
-            elif ftype == "checkbox":
-                var = self.checkbox_vars.get(name)
-                value = bool(var.get()) if var is not None else False
-            else:
-                value = widget.get().strip()
-            data[name] = value
-        return data
-
-    @staticmethod
-    def _sanitize_filename(name: str) -> str:
-        for ch in '<>:"/\\|?*':
-            name = name.replace(ch, "_")
-        name = name.strip().replace(" ", "_")
-        return name or "report"
-
-    @staticmethod
-    def _apply_template(doc: Document, placeholders: dict[str, str]):
-
-        def process_paragraph(paragraph):
-            if not paragraph.runs:
-                return
+        self.excel_bar.pack_forget()
+        self._show_loading(True)
+        self.loader.load(lambda progress: iter_any_file(file_path, progress))
 
-            full_text = "".join(run.text for run in paragraph.runs)
-            new_text = full_text
-            for ph, val in placeholders.items():
-                new_text = new_text.replace(ph, val)
+    def _load_excel_rows(self, sheet: str | None):
+        book = self.excel
+        rows = excel_rows_per_load()
+        self.more_rows_btn.config(state="disabled")
+        self._show_loading(True)
+        self.loader.load(lambda progress: book.iter_sheet(sheet, rows, progress))
 
-            if new_text == full_text:
-                return
+    def on_sheet_change(self, event=None):
+        sheet = self.sheet_combo.get()
+        if self.excel is None or sheet == self.excel.sheet:
+            return
+        self.viewer.clear()
+        self.search_builder.cancel()
+        self.extract_runner.cancel()
+        self.search_index = None
+        self._clear_search()
+        self._load_excel_rows(sheet)
+
+    def load_more_rows(self):
+        if self.excel is None or self.loader.busy or self.excel.exhausted:
+            return
+        self._load_excel_rows(self.excel.sheet)
+
+    def _update_excel_bar(self):
+        book = self.excel
+        self.sheet_combo["values"] = book.sheet_names
+        if book.sheet:
+            self.sheet_combo.set(book.sheet)
+        self.more_rows_btn.config(state="disabled" if book.exhausted else "normal")
+        status = f"Показано строк: {book.rows_shown}"
+        if book.exhausted:
+            status += " (весь лист)"
+        self.excel_status.config(text=status)
+        self.excel_bar.pack(fill="x", pady=(5, 0), after=self._top_left)
+
+    def cancel_loading(self):
+        self.loader.cancel()
+        self._show_loading(False)
+        if self.excel is not None and self.excel.sheet:
+            self._update_excel_bar()
+        self.viewer.append("\nЗагрузка отменена.")
+        self._reindex_search()
+
+    def _show_loading(self, loading: bool):
+        if loading:
+            self.load_progress.config(value=0, maximum=1)
+            self.load_status.config(text="Загрузка...")
+            self.load_progress.pack(side="left", padx=(0, 5))
+            self.load_status.pack(side="left")
+            self.load_cancel_btn.pack(side="left", padx=(10, 0))
+        else:
+            self.load_progress.pack_forget()
+            self.load_status.pack_forget()
+            self.load_cancel_btn.pack_forget()
+
+    def _on_load_progress(self, done: int, total: int):
+        self.load_progress.config(value=done, maximum=max(total, 1))
+        self.load_status.config(text=f"Загрузка: {done} из {total}")
+
+    def _on_load_chunk(self, chunk: str):
+        self.viewer.append(chunk)
+
+    def _on_load_delivered(self, chunks: list[str]):
+        # строки Excel считаются показанными, только когда дошли до окна
+        if self.excel is not None:
+            for chunk in chunks:
+                self.excel.accept(chunk)
+
+    def _on_load_done(self):
+        self._show_loading(False)
+        if self.excel is not None:
+            self._update_excel_bar()
+        text = self.viewer.get_text()
+        self._reindex_search(text)
+        self._run_extraction(text)
+
+    def _run_extraction(self, text: str | None = None) -> bool:
+        # правила полей прогоняются по документу в фоне; пустые поля
+        # заполняются найденным, совпадения подсвечиваются
+        self.viewer.clear_highlights("extract_hit")
+        if text is None:
+            text = self.viewer.get_text()
+        return self.extract_runner.run(self.fields, text, context=self.current_profile)
+
+    def _on_extract_ready(self, values: dict, spans: list, profile: str):
+        if profile != self.current_profile:
+            return
+        self.viewer.set_highlights("extract_hit", spans)
+        panel = self.form_panels.get(profile)
+        if panel is not None:
+            panel.fill_empty(values)
 
-            paragraph.runs[0].text = new_text
-            for run in paragraph.runs[1:]:
-                run.text = ""
+    def extract_fields(self):
+        if self.loader.busy:
+            return
+        if not any((f.get("rule") or "").strip() for f in self.fields):
+            messagebox.showinfo(
+                "Заполнение полей",
+                "Для полей этого шаблона не заданы правила извлечения.\n"
+                "Их можно указать в окне «Управлять полями».",
+            )
+            return
+        self._run_extraction()
 
-        for p in doc.paragraphs:
-            process_paragraph(p)
+    def _on_load_error(self, error: Exception):
+        self._show_loading(False)
+        messagebox.showerror("Ошибка", f"Не удалось прочитать файл:\n{error}")
 
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    for p in cell.paragraphs:
-                        process_paragraph(p)
+    def _focus_search(self, event=None):
+        self.search_entry.focus_set()
+        self.search_entry.select_range(0, tk.END)
+        return "break"
 
-        for section in doc.sections:
-            header = section.header
-            footer = section.footer
-            for p in header.paragraphs:
-                process_paragraph(p)
-            for p in footer.paragraphs:
-                process_paragraph(p)
+    def _reindex_search(self, text: str | None = None):
+        self._reindex_after_id = None
+        self.search_index = None
+        if text is None:
+            text = self.viewer.get_text()
+        self.search_builder.build(text)
+        if self.search_entry.get().strip():
+            self.search_status.config(text="Индексация...")
+
+    def _schedule_search_reindex(self):
+        # после правки текста индекс устарел; пересобираем, когда правки затихнут
+        if self.loader.busy:
+            return
+        if self._reindex_after_id is not None:
+            self.after_cancel(self._reindex_after_id)
+        self._reindex_after_id = self.after(500, self._reindex_search)
+
+    def _on_search_index_ready(self, index):
+        self.search_index = index
+        if self.search_entry.get().strip():
+            self._run_search()
+        else:
+            self.search_status.config(text="")
+
+    def _on_search_key(self, event):
+        if event.keysym in ("Return", "Escape", "Up", "Down", "Left", "Right"):
+            return
+        # поиск по индексу мгновенный, но не на каждую букву при быстром наборе
+        if self._search_after_id is not None:
+            self.after_cancel(self._search_after_id)
+        self._search_after_id = self.after(120, self._run_search)
+
+    def _clear_search(self, reset_entry=False):
+        if reset_entry:
+            self.search_entry.delete(0, tk.END)
+        self.search_hits = []
+        self.search_pos = -1
+        self.viewer.clear_highlights("search_hit")
+        self.viewer.clear_highlights("search_current")
+        self.search_status.config(text="")
+
+    def _run_search(self):
+        self._search_after_id = None
+        query = self.search_entry.get().strip()
+        if not query:
+            self._clear_search()
+            return
+        if self.search_index is None:
+            if self.current_file_path:
+                self.search_status.config(text="Индексация...")
+            return
+
+        self.search_hits = self.search_index.find(query)
+        self.viewer.set_highlights("search_hit", self.search_hits)
+        if not self.search_hits:
+            self.search_pos = -1
+            self.viewer.clear_highlights("search_current")
+            self.search_status.config(text="Не найдено")
+            return
+        self._goto_hit(0)
+
+    def _goto_hit(self, i: int):
+        self.search_pos = i % len(self.search_hits)
+        start, end = self.search_hits[self.search_pos]
+        self.viewer.set_highlights("search_current", [(start, end)])
+        self.viewer.see_offset(start)
+        self.search_status.config(text=f"{self.search_pos + 1} из {len(self.search_hits)}")
+
+    def search_next(self):
+        if self.search_hits:
+            self._goto_hit(self.search_pos + 1)
+        return "break"
+
+    def search_prev(self):
+        if self.search_hits:
+            self._goto_hit(self.search_pos - 1)
+        return "break"
+
+    def clear_text_cache(self):
+        cache = TextCache()
+        size_mb = cache.total_size() / (1024 * 1024)
+        cache.clear()
+        messagebox.showinfo("Кэш очищен", f"Удалено из кэша: {size_mb:.1f} МБ")
+
+    def collect_form_data(self) -> dict:
+        return self.form_panels[self.current_profile].get_values(self.fields)
 
     def save_report(self):
+        if self._report_thread is not None:
+            return
         data = self.collect_form_data()
-
-        default_name = "report.docx"
-        full_name_value = data.get("NAME")
-        if isinstance(full_name_value, str):
-            full_name_value = full_name_value.strip()
-        if full_name_value:
-            base = self._sanitize_filename(full_name_value)
-            default_name = f"{base}.docx"
-        else:
-            for f in self.fields:
-                ftype = f.get("type", "text")
-                if ftype not in ("text", "multiline"):
-                    continue
-                val = data.get(f.get("name"))
-                if isinstance(val, str):
-                    val = val.strip()
-                if val:
-                    base = self._sanitize_filename(val)
-                    default_name = f"{base}.docx"
-                    break
+        default_name = default_report_name(self.fields, data)
 
         save_path = filedialog.asksaveasfilename(
             title="Сохранить отчёт",
             defaultextension=".docx",
-            filetypes=(("Документ Word", "*.docx"),),
+            filetypes=(("Документ Word", "*.docx"), ("PDF", "*.pdf")),
             initialfile=default_name,
         )
         if not save_path:
             return
 
+        # поток получает копии: форму и поля можно править, пока идёт сохранение
+        fields = copy.deepcopy(self.fields)
+        tmpl_abs = template_abs_path(self.template_path)
+        self._report_thread = threading.Thread(
+            target=self._render_report,
+            args=(fields, data, tmpl_abs, save_path, self.current_profile, self.current_file_path),
+            daemon=True,
+        )
+        self._show_report_progress(True)
+        self._report_thread.start()
+        self.after(REPORT_POLL_MS, self._poll_report)
+
+    def _render_report(self, fields, data, tmpl_abs, save_path, profile, source_path):
+        events = self._report_events
         try:
-            tmpl_abs = self._get_template_abs_path(self.template_path)
             if tmpl_abs and os.path.exists(tmpl_abs):
-                doc = Document(tmpl_abs)
+                events.put(("progress", (0, "Чтение шаблона...")))
+                template = CompiledTemplate.load(tmpl_abs)
+                events.put(("progress", (1, "Подстановка значений...")))
+                doc = template.render(build_placeholders(fields, data))
+            else:
+                events.put(("progress", (1, "Подготовка отчёта...")))
+                doc = build_plain_report(fields, data)
+
+            events.put(("progress", (2, "Запись файла...")))
+            convert_seconds = None
+            if save_path.lower().endswith(".pdf"):
+                with tempfile.TemporaryDirectory(prefix="docform_report_") as tmp:
+                    docx_path = os.path.join(tmp, "report.docx")
+                    with span("doc.save") as sp:
+                        doc.save(docx_path)
+                        sp.note(bytes=os.path.getsize(docx_path))
+                    events.put(("progress", (3, "Конвертация в PDF...")))
+                    convert_seconds = get_converter_pool().convert(docx_path, save_path)
+            else:
+                with span("doc.save") as sp:
+                    doc.save(save_path)
+                    sp.note(bytes=os.path.getsize(save_path))
+        except Exception as e:
+            events.put(("error", e))
+            return
+        if self.history is not None:
+            # в историю — только то, что вводится в однострочные поля
+            self.history.record(
+                {f["name"]: data.get(f["name"]) for f in fields if f.get("type", "text") == "text" and f.get("name")}
+            )
+        if self.archive is not None:
+            self.archive.record(profile, data, source_path, save_path)
+        events.put(("done", (save_path, profile, data, convert_seconds)))
+
+    def _poll_report(self):
+        finished = None
+        last = None
+        while True:
+            try:
+                kind, payload = self._report_events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                last = payload
+            else:
+                finished = (kind, payload)
+
+        if last is not None:
+            step, text = last
+            self.report_progress.config(value=step)
+            self.report_status.config(text=text)
+        if finished is None:
+            self.after(REPORT_POLL_MS, self._poll_report)
+            return
+
+        self._report_thread = None
+        self._show_report_progress(False)
+        kind, payload = finished
+        if kind == "error":
+            messagebox.showerror("Ошибка", f"Не удалось сохранить отчёт:\n{payload}")
+            return
+        save_path, profile, data, convert_seconds = payload
+        self._clear_saved_draft(profile, data)
+        message = f"Отчёт сохранён:\n{save_path}"
+        if convert_seconds is not None:
+            message += f"\n\nКонвертация в PDF: {convert_seconds:.1f} с"
+        messagebox.showinfo("Готово", message)
+
+    def _clear_saved_draft(self, profile: str, data: dict):
+        # данные ушли в отчёт — черновик больше не нужен; но пока отчёт
+        # сохранялся, форму могли править: такие поля пишутся в журнал заново
+        self.journal.clear(profile)
+        panel = self.form_panels.get(profile)
+        if panel is None:
+            return
+        for name, row in panel.rows.items():
+            if name in data and row.get_value() == data[name]:
+                continue
+            self.journal.record(profile, name, row.value)
+
+    def _show_report_progress(self, busy: bool):
+        if busy:
+            self.report_progress.config(value=0, maximum=REPORT_STEPS)
+            self.report_status.config(text="")
+            self.report_status.pack(fill="x", before=self.report_btn)
+            self.report_progress.pack(fill="x", pady=(0, 5), before=self.report_btn)
+            self.report_btn.config(state="disabled")
+        else:
+            self.report_status.pack_forget()
+            self.report_progress.pack_forget()
+            self.report_btn.config(state="normal")
 
-                placeholders = {}
-                for f in self.fields:
-                    name = f.get("name")
-                    ftype = f.get("type", "text")
-                    raw_value = data.get(name)
+    def open_batch_dialog(self):
+        dialog = tk.Toplevel(self)
+        dialog.title(f"Пакетная генерация ({self.current_profile})")
+        dialog.grab_set()
+        dialog.resizable(False, False)
 
-                    if ftype == "checkbox":
-                        val = "Да" if raw_value else ""
-                    else:
-                        val = (raw_value or "").strip()
+        ttk.Label(dialog, text="Таблица значений (CSV / XLSX, заголовки — имена полей):").grid(
+            row=0, column=0, columnspan=2, sticky="w", padx=10, pady=(10, 2)
+        )
+        rows_entry = ttk.Entry(dialog, width=50)
+        rows_entry.grid(row=1, column=0, sticky="we", padx=(10, 5))
 
-                    ph = f"{{{{{name}}}}}"  # {{NAME}}
-                    placeholders[ph] = val
+        ttk.Label(dialog, text="Папка для отчётов:").grid(
+            row=2, column=0, columnspan=2, sticky="w", padx=10, pady=(10, 2)
+        )
+        out_entry = ttk.Entry(dialog, width=50)
+        out_entry.grid(row=3, column=0, sticky="we", padx=(10, 5))
 
-                self._apply_template(doc, placeholders)
-            else:
-                doc = Document()
-                for f in self.fields:
-                    name = f.get("name")
-                    label = f.get("label", name)
-                    ftype = f.get("type", "text")
-                    raw_value = data.get(name)
-
-                    if ftype == "checkbox":
-                        if not raw_value:
-                            continue
-                        val = "Да"
-                    else:
-                        val = (raw_value or "").strip()
-                        if not val:
-                            continue
-
-                    doc.add_paragraph(f"{label}: {val}")
-
-            doc.save(save_path)
-            messagebox.showinfo("Готово", f"Отчёт сохранён:\n{save_path}")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось сохранить отчёт:\n{e}")
+        def browse_rows():
+            path = filedialog.askopenfilename(
+                parent=dialog,
+                title="Выберите таблицу",
+                filetypes=(("Таблицы", "*.csv *.xlsx *.xls"), ("Все файлы", "*.*")),
+            )
+            if path:
+                rows_entry.delete(0, tk.END)
+                rows_entry.insert(0, path)
+
+        def browse_out():
+            path = filedialog.askdirectory(parent=dialog, title="Выберите папку")
+            if path:
+                out_entry.delete(0, tk.END)
+                out_entry.insert(0, path)
+
+        ttk.Button(dialog, text="Обзор...", command=browse_rows).grid(row=1, column=1, padx=(0, 10))
+        ttk.Button(dialog, text="Обзор...", command=browse_out).grid(row=3, column=1, padx=(0, 10))
+
+        format_frame = ttk.Frame(dialog)
+        format_frame.grid(row=4, column=0, columnspan=2, sticky="w", padx=10, pady=(10, 0))
+        ttk.Label(format_frame, text="Формат:").pack(side="left")
+        format_combo = ttk.Combobox(format_frame, values=["docx", "pdf"], state="readonly", width=8)
+        format_combo.set("docx")
+        format_combo.pack(side="left", padx=5)
+
+        progress = ttk.Progressbar(dialog, mode="determinate")
+        progress.grid(row=5, column=0, columnspan=2, sticky="we", padx=10, pady=(15, 2))
+        status = ttk.Label(dialog, text="")
+        status.grid(row=6, column=0, columnspan=2, sticky="w", padx=10)
+
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.grid(row=7, column=0, columnspan=2, sticky="e", padx=10, pady=10)
+
+        events = queue.Queue()
+        cancel_event = threading.Event()
+        fields = copy.deepcopy(self.fields)
+        profile = self.current_profile
+        tmpl_abs = template_abs_path(self.template_path)
+        if tmpl_abs and not os.path.exists(tmpl_abs):
+            tmpl_abs = None
+
+        def work(rows_path, out_dir, output_format):
+            try:
+                rows = read_rows(rows_path)
+                result = run_batch(
+                    fields, tmpl_abs, rows, out_dir,
+                    progress=lambda done, total: events.put(("progress", (done, total))),
+                    cancel_event=cancel_event,
+                    output_format=output_format,
+                )
+            except Exception as e:
+                events.put(("error", e))
+                return
+            if self.archive is not None:
+                self.archive.record_many(profile, result.reports, os.path.abspath(rows_path))
+            events.put(("done", result))
+
+        def poll():
+            finished = None
+            last = None
+            while True:
+                try:
+                    kind, payload = events.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "progress":
+                    last = payload
+                else:
+                    finished = (kind, payload)
+
+            if not dialog.winfo_exists():
+                return
+            if last is not None:
+                done, total = last
+                progress.config(value=done, maximum=max(total, 1))
+                status.config(text=f"Готово {done} из {total}")
+            if finished is None:
+                dialog.after(100, poll)
+                return
+
+            start_btn.config(state="normal")
+            kind, payload = finished
+            if kind == "error":
+                status.config(text="")
+                messagebox.showerror("Ошибка", f"Не удалось выполнить генерацию:\n{payload}", parent=dialog)
+                return
+            result = payload
+            text = (
+                f"Готово {len(result.done)} из {result.total} за {result.seconds:.1f} с "
+                f"({result.throughput:.1f} отч./с)"
+            )
+            if result.convert_seconds:
+                text += f", PDF в среднем за {result.mean_convert_seconds:.2f} с"
+            status.config(text=text)
+            if result.failed:
+                errors = "\n".join(f"{os.path.basename(p)}: {err}" for p, err in result.failed[:10])
+                messagebox.showerror("Ошибка", f"Не удалось создать {len(result.failed)} отч.:\n{errors}", parent=dialog)
+
+        def start():
+            rows_path = rows_entry.get().strip()
+            out_dir = out_entry.get().strip()
+            if not rows_path or not out_dir:
+                messagebox.showerror("Ошибка", "Укажите таблицу и папку для отчётов.", parent=dialog)
+                return
+            cancel_event.clear()
+            start_btn.config(state="disabled")
+            status.config(text="Подготовка...")
+            threading.Thread(
+                target=work, args=(rows_path, out_dir, format_combo.get()), daemon=True
+            ).start()
+            dialog.after(100, poll)
+
+        def close():
+            cancel_event.set()
+            dialog.destroy()
+
+        start_btn = ttk.Button(btn_frame, text="Создать отчёты", command=start)
+        start_btn.pack(side="right", padx=(5, 0))
+        ttk.Button(btn_frame, text="Закрыть", command=close).pack(side="right")
+        dialog.protocol("WM_DELETE_WINDOW", close)
+        dialog.columnconfigure(0, weight=1)
+
+    def open_archive_dialog(self):
+        dialog = tk.Toplevel(self)
+        dialog.title("Архив отчётов")
+        dialog.geometry("900x500")
+
+        top = ttk.Frame(dialog)
+        top.pack(fill="x", padx=10, pady=(10, 5))
+        ttk.Label(top, text="Поиск:").pack(side="left")
+        query_entry = ttk.Entry(top)
+        query_entry.pack(side="left", fill="x", expand=True, padx=5)
+        all_profiles = "Все шаблоны"
+        profile_combo = ttk.Combobox(
+            top, values=[all_profiles] + self.archive.profiles(), state="readonly", width=25
+        )
+        profile_combo.set(all_profiles)
+        profile_combo.pack(side="left")
+
+        table = ttk.Frame(dialog)
+        table.pack(fill="both", expand=True, padx=10)
+        tree = ttk.Treeview(
+            table, columns=("date", "profile", "values", "output"), show="headings", selectmode="browse"
+        )
+        for column, title, width in (
+            ("date", "Дата", 120),
+            ("profile", "Шаблон", 120),
+            ("values", "Значения", 380),
+            ("output", "Файл отчёта", 250),
+        ):
+            tree.heading(column, text=title)
+            tree.column(column, width=width, stretch=column in ("values", "output"))
+        scroll = ttk.Scrollbar(table, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scroll.set)
+        tree.pack(side="left", fill="both", expand=True)
+        scroll.pack(side="right", fill="y")
+
+        status = ttk.Label(dialog, text="")
+        status.pack(fill="x", padx=10, pady=(5, 0))
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.pack(fill="x", padx=10, pady=10)
+
+        reports = {}
+        pending = [None]
+
+        def refresh():
+            pending[0] = None
+            profile = profile_combo.get()
+            found = self.archive.search(query_entry.get(), None if profile == all_profiles else profile)
+            reports.clear()
+            tree.delete(*tree.get_children())
+            for report in found:
+                values = [" ".join(v.split()) for v in report.data.values() if isinstance(v, str) and v]
+                summary = "; ".join(values)
+                if len(summary) > 120:
+                    summary = summary[:117] + "..."
+                iid = str(report.id)
+                reports[iid] = report
+                tree.insert("", tk.END, iid=iid, values=(
+                    time.strftime("%d.%m.%Y %H:%M", time.localtime(report.created)),
+                    report.profile,
+                    summary,
+                    report.output_path,
+                ))
+            text = f"Найдено: {len(found)}"
+            if len(found) >= MAX_ARCHIVE_RESULTS:
+                text += " (показаны самые свежие, уточните запрос)"
+            status.config(text=text)
+
+        def schedule_refresh(event=None):
+            if pending[0] is not None:
+                dialog.after_cancel(pending[0])
+            pending[0] = dialog.after(ARCHIVE_SEARCH_DELAY_MS, refresh)
+
+        def selected():
+            selection = tree.selection()
+            return reports.get(selection[0]) if selection else None
+
+        def open_in_form(event=None):
+            report = selected()
+            if report is None:
+                return
+            if report.profile not in self.profiles:
+                messagebox.showerror(
+                    "Ошибка", f"Шаблона полей «{report.profile}» больше нет.", parent=dialog
+                )
+                return
+            if report.profile != self.current_profile:
+                self.profile_combo.set(report.profile)
+                self.on_profile_change()
+            data = self.collect_form_data()
+            if any(v not in ("", False) for v in data.values()) and not messagebox.askyesno(
+                "Архив отчётов", "Заменить значения формы данными отчёта?", parent=dialog
+            ):
+                return
+            panel = self.form_panels[self.current_profile]
+            values = {name: value for name, value in report.data.items() if name in panel.rows}
+            panel.set_values(values)
+            # у ещё не созданных строк правку не увидит обработчик виджета
+            for name, value in values.items():
+                self.journal.record(self.current_profile, name, value)
+            dialog.destroy()
+
+        def delete():
+            report = selected()
+            if report is None:
+                return
+            if not messagebox.askyesno(
+                "Архив отчётов", "Удалить запись из архива? Файл отчёта останется на диске.", parent=dialog
+            ):
+                return
+            self.archive.delete(report.id)
+            refresh()
+
+        ttk.Button(btn_frame, text="Закрыть", command=dialog.destroy).pack(side="right")
+        ttk.Button(btn_frame, text="Открыть в форме", command=open_in_form).pack(side="right", padx=(0, 5))
+        ttk.Button(btn_frame, text="Удалить из архива", command=delete).pack(side="left")
+
+        query_entry.bind("<KeyRelease>", schedule_refresh)
+        query_entry.bind("<Return>", lambda e: refresh())
+        profile_combo.bind("<<ComboboxSelected>>", schedule_refresh)
+        tree.bind("<Double-1>", open_in_form)
+        tree.bind("<Return>", open_in_form)
+        self._attach_entry_context_menu(query_entry)
+        refresh()
+        query_entry.focus_set()
 
 
 if __name__ == "__main__":
+    # нужно для параллельного разбора PDF в собранном main.exe
+    multiprocessing.freeze_support()
+    setup_logging()
     app = FileFormApp()
     app.mainloop()
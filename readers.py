@@ -0,0 +1,531 @@
+import datetime
+import itertools
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from xml.etree import ElementTree
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import TextCache
+from config import SETTINGS, log
+from instrument import note, traced_reader
+
+TEXT_BLOCK_SIZE = 1024 * 1024
+EXCEL_BLOCK_ROWS = 500
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+def _no_progress(done: int, total: int):
+    pass
+
+
+# Все читалки — генераторы: отдают текст кусками (страница, лист, блок),
+# чтобы окно могло показывать документ по мере извлечения.
+# progress(done, total) вызывается после каждого куска; если он бросит
+# LoadCancelled, чтение прерывается.
+@traced_reader("read_any_file")
+def iter_any_file(path: str, progress=None, use_cache=None):
+    progress = progress or _no_progress
+    reader = _pick_reader(path)
+    if reader is None:
+        return iter(["Формат файла не поддерживается."])
+    if use_cache is None:
+        use_cache = bool(SETTINGS.get("cache_enabled"))
+    if not use_cache:
+        return reader(path, progress)
+    return _iter_through_cache(TextCache(), path, reader, progress)
+
+
+def _pick_reader(path: str):
+    path_l = path.lower()
+    if path_l.endswith((".txt", ".log", ".md")):
+        return iter_text
+    if path_l.endswith(".pdf"):
+        return iter_pdf
+    if path_l.endswith((".doc", ".docx")):
+        return iter_word
+    if path_l.endswith((".xls", ".xlsx")):
+        return iter_excel
+    return None
+
+
+def _iter_through_cache(cache: TextCache, path: str, reader, progress):
+    key = cache.key(path)
+    cached = cache.iter_cached(key)
+    # сколько символов уже отдано из кэша, если запись оказалась испорченной
+    emitted = 0
+    if cached is not None:
+        note(cache="hit")
+        try:
+            for chunk in cached:
+                emitted += len(chunk)
+                yield chunk
+        except (zlib.error, UnicodeDecodeError):
+            # запись удаляется, а текст дочитывается из самого файла
+            log.warning("Испорченная запись кэша для %s", path)
+            cache.remove(key)
+            note(cache="corrupt")
+        else:
+            progress(1, 1)
+            return
+
+    writer = cache.writer(key)
+    try:
+        for chunk in reader(path, progress):
+            writer.write(chunk)
+            if emitted:
+                # читалка выдаёт тот же текст, что лежал в кэше: начало пропускаем
+                if len(chunk) <= emitted:
+                    emitted -= len(chunk)
+                    continue
+                chunk = chunk[emitted:]
+                emitted = 0
+            yield chunk
+    except BaseException:
+        # ошибка, отмена или закрытый генератор — неполный текст не кэшируем
+        writer.abort()
+        raise
+    try:
+        writer.commit()
+    except OSError:
+        # текст уже у пользователя — без кэша можно обойтись
+        log.exception("Не удалось записать кэш для %s", path)
+        writer.abort()
+
+
+def read_any_file(path: str, progress=None) -> str:
+    return "".join(iter_any_file(path, progress))
+
+
+@traced_reader("read_text")
+def iter_text(path: str, progress=_no_progress):
+    total = max(1, -(-os.path.getsize(path) // TEXT_BLOCK_SIZE))
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        done = 0
+        while True:
+            block = f.read(TEXT_BLOCK_SIZE)
+            if not block:
+                break
+            done += 1
+            yield block
+            # размер в байтах, а блоки в символах — оценка приблизительная
+            progress(min(done, total - 1), total)
+    progress(total, total)
+
+
+def _pdf_workers() -> int:
+    workers = int(SETTINGS.get("pdf_workers") or 0)
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def _extract_pdf_slice(path: str, start: int, stop: int) -> list[str]:
+    # выполняется в дочернем процессе: каждый воркер сам открывает файл
+    # и разбирает только свои страницы (pdfplumber нумерует их с 1)
+    import pdfplumber
+
+    with pdfplumber.open(path, pages=range(start + 1, stop + 1)) as pdf:
+        return [(page.extract_text() or "") + "\n" for page in pdf.pages]
+
+
+@traced_reader("read_pdf")
+def iter_pdf(path: str, progress=_no_progress, workers=None, min_pages=None):
+    if workers is None:
+        workers = _pdf_workers()
+    if min_pages is None:
+        min_pages = int(SETTINGS.get("pdf_parallel_min_pages") or 0)
+
+    # тяжёлые библиотеки грузим при первом чтении, а не при старте программы
+    import pdfplumber
+
+    with pdfplumber.open(path) as pdf:
+        total = len(pdf.pages)
+        note(pages=total)
+        if not total:
+            yield "PDF не содержит распознаваемый текст (возможно, только картинки)."
+            return
+        if workers > 1 and total >= min_pages:
+            parallel = True
+            note(workers=workers)
+        else:
+            parallel = False
+            for i, page in enumerate(pdf.pages, 1):
+                yield (page.extract_text() or "") + "\n"
+                # pdfplumber кэширует разобранные объекты страницы — освобождаем,
+                # иначе память растёт вместе с числом страниц
+                page.flush_cache()
+                progress(i, total)
+
+    if parallel:
+        yield from _iter_pdf_parallel(path, total, workers, progress)
+
+
+def _iter_pdf_parallel(path: str, total: int, workers: int, progress):
+    # нарезаем мельче, чем число воркеров: так первые страницы приходят
+    # быстрее, а медленные куски не задерживают остальные процессы
+    slice_size = max(1, -(-total // (workers * 4)))
+    bounds = [(start, min(start + slice_size, total)) for start in range(0, total, slice_size)]
+
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(bounds)))
+    try:
+        futures = [executor.submit(_extract_pdf_slice, path, start, stop) for start, stop in bounds]
+        for future, (start, stop) in zip(futures, bounds):
+            for page_text in future.result():
+                yield page_text
+            progress(stop, total)
+    finally:
+        # при отмене не ждём оставшиеся куски
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def read_pdf(path: str, progress=_no_progress, workers=None, min_pages=None) -> str:
+    return "".join(iter_pdf(path, progress, workers, min_pages))
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_P = _W + "p"
+_W_T = _W + "t"
+_W_TAB = _W + "tab"
+_W_BR = _W + "br"
+_W_CR = _W + "cr"
+_W_TC = _W + "tc"
+_W_TR = _W + "tr"
+_W_VAL = _W + "val"
+
+
+class _CountingReader:
+    # считает прочитанные байты, чтобы показывать прогресс разбора XML
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.count += len(data)
+        return data
+
+
+def _iter_word_part(stream):
+    # один потоковый проход по XML части документа: абзацы и таблицы
+    # в порядке следования; строка таблицы — ячейки через " | "
+    para_stack = []
+    cell_stack = []
+    row_stack = []
+    for event, elem in ElementTree.iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == _W_P:
+                para_stack.append([])
+            elif tag == _W_TC:
+                cell_stack.append([])
+            elif tag == _W_TR:
+                row_stack.append([])
+            continue
+
+        if tag == _W_T:
+            if para_stack:
+                para_stack[-1].append(elem.text or "")
+        elif tag == _W_TAB:
+            # w:tab с атрибутом val — это позиция табуляции в свойствах абзаца
+            if para_stack and elem.get(_W_VAL) is None:
+                para_stack[-1].append("\t")
+        elif tag in (_W_BR, _W_CR):
+            if para_stack:
+                para_stack[-1].append("\n")
+        elif tag == _W_P:
+            text = "".join(para_stack.pop())
+            if cell_stack:
+                cell_stack[-1].append(text)
+            else:
+                yield text
+            elem.clear()
+        elif tag == _W_TC:
+            cell = " ".join(t for t in cell_stack.pop() if t)
+            if row_stack:
+                row_stack[-1].append(cell)
+        elif tag == _W_TR:
+            line = " | ".join(row_stack.pop())
+            if cell_stack:
+                cell_stack[-1].append(line)
+            else:
+                yield line
+            elem.clear()
+
+
+def _iter_docx(path: str, progress):
+    with zipfile.ZipFile(path) as zf:
+        names = zf.namelist()
+        headers = sorted(n for n in names if re.fullmatch(r"word/header\d*\.xml", n))
+        footers = sorted(n for n in names if re.fullmatch(r"word/footer\d*\.xml", n))
+
+        def part_text(part_names):
+            seen = []
+            for name in part_names:
+                with zf.open(name) as f:
+                    text = "\n".join(t for t in _iter_word_part(f) if t.strip())
+                if text and text not in seen:
+                    seen.append(text)
+            return "\n".join(seen)
+
+        header_text = part_text(headers)
+        if header_text:
+            yield header_text + "\n\n"
+
+        total = zf.getinfo("word/document.xml").file_size
+        with zf.open("word/document.xml") as f:
+            reader = _CountingReader(f)
+            lines = []
+            for line in _iter_word_part(reader):
+                lines.append(line)
+                if len(lines) >= 200:
+                    yield "\n".join(lines) + "\n"
+                    lines = []
+                    progress(min(reader.count, total), total)
+            if lines:
+                yield "\n".join(lines) + "\n"
+
+        footer_text = part_text(footers)
+        if footer_text:
+            yield "\n" + footer_text + "\n"
+        progress(total, total)
+
+
+@traced_reader("read_word")
+def iter_word(path: str, progress=_no_progress):
+    if zipfile.is_zipfile(path):
+        # .docx (или .docx с расширением .doc)
+        yield from _iter_docx(path, progress)
+        return
+
+    # старый двоичный .doc: конвертируем в .docx локальным LibreOffice
+    from convert import convert_file
+
+    with tempfile.TemporaryDirectory(prefix="docform_") as tmp:
+        converted = convert_file(path, "docx", tmp)
+        yield from _iter_docx(converted, progress)
+
+
+def read_word(path: str, progress=_no_progress) -> str:
+    return "".join(iter_word(path, progress))
+
+
+def cell_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime):
+        if value.time() == datetime.time(0, 0):
+            return value.strftime("%d.%m.%Y")
+        return value.strftime("%d.%m.%Y %H:%M")
+    if isinstance(value, datetime.date):
+        return value.strftime("%d.%m.%Y")
+    return str(value)
+
+
+def _row_text(row) -> str:
+    cells = list(row)
+    while cells and cells[-1] in (None, ""):
+        cells.pop()
+    return " | ".join(map(cell_text, cells))
+
+
+# Порция строк листа: текст плюс сколько в нём строк и закончился ли лист.
+class SheetChunk(str):
+    rows = 0
+    header = False
+    last = False
+
+
+def _sheet_chunk(text: str, rows: int = 0, header: bool = False, last: bool = False) -> SheetChunk:
+    chunk = SheetChunk(text)
+    chunk.rows = rows
+    chunk.header = header
+    chunk.last = last
+    return chunk
+
+
+# Книга Excel без загрузки целиком: листы открываются по требованию,
+# строки читаются потоково порциями, и каждая следующая порция продолжает
+# с того места, где остановилась предыдущая. Показанными считаются только
+# порции, которые окно подтвердило через accept(): отменённая загрузка
+# теряет прочитанное, и следующая начинает с первой неподтверждённой строки.
+class ExcelWorkbook:
+    def __init__(self, path: str):
+        self.path = path
+        self.is_xls = path.lower().endswith(".xls")
+        self.sheet_names = []
+        self.sheet = None
+        self.rows_shown = 0
+        self.exhausted = False
+        self._header_shown = False
+        self._book = None
+        self._rows = None
+        # сколько строк уже взято из _rows
+        self._read = 0
+        # порцию строк читает один поток за раз: отменённая загрузка
+        # должна отпустить курсор листа, прежде чем его возьмёт следующая
+        self._lock = threading.Lock()
+
+    def open(self):
+        if self._book is not None:
+            return
+        if self.is_xls:
+            import xlrd
+
+            self._book = xlrd.open_workbook(self.path, on_demand=True)
+            self.sheet_names = self._book.sheet_names()
+        else:
+            import openpyxl
+
+            self._book = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+            self.sheet_names = list(self._book.sheetnames)
+
+    def close(self):
+        self._rows = None
+        if self._book is None:
+            return
+        if self.is_xls:
+            self._book.release_resources()
+        else:
+            self._book.close()
+        self._book = None
+
+    def iter_rows(self, sheet: str | None = None):
+        # сырые значения ячеек построчно, без форматирования
+        self.open()
+        if sheet is None:
+            sheet = self.sheet_names[0]
+        return self._iter_rows(sheet)
+
+    def _iter_rows(self, sheet: str):
+        if self.is_xls:
+            import xlrd
+
+            sh = self._book.sheet_by_name(sheet)
+            datemode = self._book.datemode
+            try:
+                for i in range(sh.nrows):
+                    values = sh.row_values(i)
+                    # xlrd отдаёт даты числом дней — переводим, как openpyxl
+                    for j, ctype in enumerate(sh.row_types(i)):
+                        if ctype == xlrd.XL_CELL_DATE:
+                            try:
+                                values[j] = xlrd.xldate_as_datetime(values[j], datemode)
+                            except (ValueError, OverflowError, xlrd.xldate.XLDateError):
+                                pass
+                    yield values
+            finally:
+                self._book.unload_sheet(sheet)
+        else:
+            yield from self._book[sheet].iter_rows(values_only=True)
+
+    def iter_sheet(self, sheet: str | None, max_rows: int, progress=_no_progress):
+        with self._lock:
+            yield from self._iter_sheet(sheet, max_rows, progress)
+
+    def _iter_sheet(self, sheet: str | None, max_rows: int, progress):
+        self.open()
+        if sheet is None:
+            sheet = self.sheet_names[0] if self.sheet_names else None
+        if sheet is None:
+            return
+        if sheet != self.sheet:
+            self.sheet = sheet
+            self._rows = None
+            self.rows_shown = 0
+            self.exhausted = False
+            self._header_shown = False
+        if self._rows is None or self._read != self.rows_shown:
+            # новый лист или прошлая загрузка отменена: читаем заново
+            # с первой строки, которой ещё нет в окне
+            self._rows = itertools.islice(self._iter_rows(sheet), self.rows_shown, None)
+            self._read = self.rows_shown
+        if not self._header_shown:
+            yield _sheet_chunk(f"=== Лист: {sheet} ===\n", header=True)
+
+        lines = []
+        n = 0
+        last = False
+        for row in self._rows:
+            lines.append(_row_text(row))
+            n += 1
+            if len(lines) >= EXCEL_BLOCK_ROWS:
+                self._read += len(lines)
+                yield _sheet_chunk("\n".join(lines) + "\n", rows=len(lines))
+                lines = []
+                progress(n, max_rows)
+            if n >= max_rows:
+                break
+        else:
+            last = True
+
+        if lines or last:
+            self._read += len(lines)
+            yield _sheet_chunk("\n".join(lines) + "\n" if lines else "", rows=len(lines), last=last)
+        progress(max_rows, max_rows)
+
+    def accept(self, chunk: str):
+        # порция дошла до окна
+        if not isinstance(chunk, SheetChunk):
+            return
+        self.rows_shown += chunk.rows
+        if chunk.header:
+            self._header_shown = True
+        if chunk.last:
+            self.exhausted = True
+
+
+def excel_rows_per_load() -> int:
+    return int(SETTINGS.get("excel_rows_per_load") or 0) or 2000
+
+
+@traced_reader("read_excel")
+def iter_excel(path: str, progress=_no_progress):
+    # весь текст книги (все листы целиком) — для кэша и командной строки;
+    # окно читает Excel через ExcelWorkbook порциями
+    book = ExcelWorkbook(path)
+    try:
+        book.open()
+        total = len(book.sheet_names)
+        note(sheets=total)
+        for i, sheet_name in enumerate(book.sheet_names, 1):
+            while not book.exhausted or book.sheet != sheet_name:
+                for chunk in book.iter_sheet(sheet_name, EXCEL_BLOCK_ROWS):
+                    book.accept(chunk)
+                    yield chunk
+            yield "\n"
+            progress(i, total)
+    finally:
+        book.close()
+
+
+def read_excel(path: str, progress=_no_progress) -> str:
+    return "".join(iter_excel(path, progress))
+
+
+if __name__ == "__main__":
+    # сравнение последовательного и параллельного разбора PDF:
+    #   python readers.py file.pdf [воркеров]
+    pdf_path = sys.argv[1]
+    n_workers = int(sys.argv[2]) if len(sys.argv) > 2 else _pdf_workers()
+
+    t0 = time.perf_counter()
+    serial = read_pdf(pdf_path, workers=1)
+    t_serial = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    parallel = read_pdf(pdf_path, workers=n_workers, min_pages=0)
+    t_parallel = time.perf_counter() - t0
+
+    print(f"последовательно: {t_serial:.2f} с")
+    print(f"параллельно ({n_workers} проц.): {t_parallel:.2f} с")
+    print(f"ускорение: x{t_serial / t_parallel:.2f}")
+    print("текст совпадает" if serial == parallel else "ТЕКСТ РАЗЛИЧАЕТСЯ")
@@ -0,0 +1,348 @@
+import copy
+import io
+import json
+import os
+import re
+import threading
+
+from config import config_stamp, load_config, template_abs_path
+from instrument import note, traced
+
+PLACEHOLDER_RE = re.compile(r"\{\{([^{}]+)\}\}")
+
+INDEX_SUFFIX = ".index.json"
+INDEX_VERSION = 1
+
+TRUE_VALUES = {"1", "+", "x", "да", "д", "истина", "true", "yes", "y"}
+
+
+# Подстановка значений за один проход: вместо str.replace для каждого поля
+# текст абзаца один раз сканируется регуляркой по маркерам {{ИМЯ}}.
+class PlaceholderEngine:
+    def __init__(self, placeholders: dict[str, str]):
+        # ключи — готовые маркеры вида "{{NAME}}"
+        self.placeholders = placeholders
+
+    def _replace(self, match):
+        token = match.group(0)
+        return self.placeholders.get(token, token)
+
+    def substitute(self, text: str) -> str:
+        if "{{" not in text:
+            return text
+        return PLACEHOLDER_RE.sub(self._replace, text)
+
+
+# python-docx подгружается при первом рендеринге: модуль импортируется
+# и окном, и командной строкой, и старт не должен за это платить
+def _template_parts(doc) -> dict:
+    from docx.opc.constants import RELATIONSHIP_TYPE as RT
+
+    # тело документа и все колонтитулы (включая первую страницу и чётные)
+    parts = {str(doc.part.partname): doc.part.element}
+    for rel in doc.part.rels.values():
+        if rel.is_external or rel.reltype not in (RT.HEADER, RT.FOOTER):
+            continue
+        parts[str(rel.target_part.partname)] = rel.target_part.element
+    return parts
+
+
+def build_template_index(doc) -> list[dict]:
+    from docx.oxml.ns import qn
+
+    locations = []
+    for partname, root in _template_parts(doc).items():
+        for ordinal, p in enumerate(root.iter(qn("w:p"))):
+            if "{{" not in "".join(p.itertext()):
+                continue
+
+            texts = [r.text for r in p.findall(qn("w:r"))]
+            full_text = "".join(texts)
+            matches = list(PLACEHOLDER_RE.finditer(full_text))
+            if not matches:
+                continue
+
+            # границы run-ов в тексте абзаца, чтобы понять, какие run-ы
+            # покрывает каждый маркер
+            ends = []
+            pos = 0
+            for t in texts:
+                pos += len(t)
+                ends.append(pos)
+
+            def run_at(offset):
+                for i, end in enumerate(ends):
+                    if offset < end:
+                        return i
+                return len(ends) - 1
+
+            locations.append({
+                "part": partname,
+                "p": ordinal,
+                "runs": [run_at(matches[0].start()), run_at(matches[-1].end() - 1)],
+                "names": [m.group(1) for m in matches],
+            })
+    return locations
+
+
+def template_index_path(template_abs: str) -> str:
+    return template_abs + INDEX_SUFFIX
+
+
+def _template_stamp(template_abs: str) -> dict:
+    st = os.stat(template_abs)
+    return {"version": INDEX_VERSION, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+@traced("compile_template")
+def compile_template(template_abs: str, doc=None) -> list[dict]:
+    # индекс сохраняется рядом с шаблоном: <профиль>.docx.index.json
+    if doc is None:
+        from docx import Document
+
+        doc = Document(template_abs)
+    locations = build_template_index(doc)
+    note(placeholders=len(locations))
+    data = dict(_template_stamp(template_abs), locations=locations)
+    try:
+        with open(template_index_path(template_abs), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+    except OSError:
+        pass
+    return locations
+
+
+def load_template_index(template_abs: str) -> list[dict] | None:
+    try:
+        with open(template_index_path(template_abs), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    stamp = _template_stamp(template_abs)
+    if any(data.get(k) != v for k, v in stamp.items()):
+        return None
+    return data.get("locations")
+
+
+def remove_template_index(template_abs: str):
+    try:
+        os.remove(template_index_path(template_abs))
+    except OSError:
+        pass
+
+
+# Шаблон вместе с индексом мест, где стоят маркеры: при рендеринге
+# трогаются только эти абзацы, остальной документ не обходится.
+class CompiledTemplate:
+    def __init__(self, doc, locations: list[dict]):
+        self.doc = doc
+        self.locations = locations
+
+    @classmethod
+    def load(cls, template_abs: str) -> "CompiledTemplate":
+        from docx import Document
+
+        doc = Document(template_abs)
+        locations = load_template_index(template_abs)
+        if locations is None:
+            locations = compile_template(template_abs, doc)
+        return cls(doc, locations)
+
+    @classmethod
+    def from_document(cls, doc) -> "CompiledTemplate":
+        return cls(doc, build_template_index(doc))
+
+    def _paragraph_elements(self):
+        from docx.oxml.ns import qn
+
+        parts = _template_parts(self.doc)
+        by_part = {}
+        for loc in self.locations:
+            root = parts.get(loc["part"])
+            if root is None:
+                continue
+            if loc["part"] not in by_part:
+                by_part[loc["part"]] = list(root.iter(qn("w:p")))
+            paragraphs = by_part[loc["part"]]
+            if loc["p"] < len(paragraphs):
+                yield loc, paragraphs[loc["p"]]
+
+    @traced("apply_template")
+    def render(self, placeholders: dict[str, str]):
+        from docx.oxml.ns import qn
+
+        note(fields=len(placeholders), placeholders=len(self.locations))
+        engine = PlaceholderEngine(placeholders)
+        for loc, p in self._paragraph_elements():
+            runs = p.findall(qn("w:r"))
+            first, last = loc["runs"]
+            span = runs[first:last + 1]
+            if not span:
+                continue
+
+            # маркеры могут быть разбиты Word-ом на несколько run-ов:
+            # склеиваем только покрытые ими run-ы, остальные сохраняют форматирование
+            full_text = "".join(r.text for r in span)
+            new_text = engine.substitute(full_text)
+            if new_text == full_text:
+                continue
+
+            span[0].text = new_text
+            for r in span[1:]:
+                r.text = ""
+        return self.doc
+
+    def save_rendered(self, placeholders: dict[str, str], target):
+        # один разобранный шаблон используется для многих отчётов: после
+        # сохранения изменённые абзацы подменяются их исходными копиями
+        originals = [(p, copy.deepcopy(p)) for _, p in self._paragraph_elements()]
+        try:
+            self.render(placeholders)
+            self.doc.save(target)
+        finally:
+            for current, original in originals:
+                current.getparent().replace(current, original)
+
+
+def apply_template(doc, placeholders: dict[str, str]):
+    CompiledTemplate.from_document(doc).render(placeholders)
+
+
+def sanitize_filename(name: str) -> str:
+    for ch in '<>:"/\\|?*':
+        name = name.replace(ch, "_")
+    name = name.strip().replace(" ", "_")
+    return name or "report"
+
+
+def default_report_name(fields: list[dict], data: dict) -> str:
+    full_name_value = data.get("NAME")
+    if isinstance(full_name_value, str):
+        full_name_value = full_name_value.strip()
+    if full_name_value:
+        return f"{sanitize_filename(full_name_value)}.docx"
+
+    for f in fields:
+        ftype = f.get("type", "text")
+        if ftype not in ("text", "multiline"):
+            continue
+        val = data.get(f.get("name"))
+        if isinstance(val, str):
+            val = val.strip()
+        if val:
+            return f"{sanitize_filename(val)}.docx"
+    return "report.docx"
+
+
+def coerce_values(fields: list[dict], values: dict) -> dict:
+    # значения из таблиц и командной строки приходят строками:
+    # для галочек понимаем «да», «1», «x» и т.п.
+    data = {}
+    for f in fields:
+        name = f.get("name")
+        raw = values.get(name)
+        if f.get("type", "text") == "checkbox":
+            if isinstance(raw, str):
+                raw = raw.strip().lower() in TRUE_VALUES
+            data[name] = bool(raw)
+        else:
+            data[name] = "" if raw is None else str(raw)
+    return data
+
+
+def build_placeholders(fields: list[dict], data: dict) -> dict[str, str]:
+    placeholders = {}
+    for f in fields:
+        name = f.get("name")
+        ftype = f.get("type", "text")
+        raw_value = data.get(name)
+
+        if ftype == "checkbox":
+            val = "Да" if raw_value else ""
+        else:
+            val = (raw_value or "").strip()
+
+        ph = f"{{{{{name}}}}}"  # {{NAME}}
+        placeholders[ph] = val
+    return placeholders
+
+
+def build_plain_report(fields: list[dict], data: dict):
+    # отчёт без шаблона: просто «Метка: значение» по заполненным полям
+    from docx import Document
+
+    doc = Document()
+    for f in fields:
+        name = f.get("name")
+        label = f.get("label", name)
+        ftype = f.get("type", "text")
+        raw_value = data.get(name)
+
+        if ftype == "checkbox":
+            if not raw_value:
+                continue
+            val = "Да"
+        else:
+            val = (raw_value or "").strip()
+            if not val:
+                continue
+
+        doc.add_paragraph(f"{label}: {val}")
+    return doc
+
+
+# Кэши для render(): конфиг перечитывается только при изменении файла,
+# а каждый шаблон разбирается один раз на процесс
+_config_cache = {"stamp": None, "config": None}
+_template_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _file_stamp(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _cached_config() -> dict:
+    stamp = config_stamp()
+    with _cache_lock:
+        if _config_cache["config"] is None or _config_cache["stamp"] != stamp:
+            _config_cache["config"] = load_config()
+            _config_cache["stamp"] = stamp
+        return _config_cache["config"]
+
+
+def _cached_template(template_abs: str) -> tuple[CompiledTemplate, threading.Lock]:
+    stamp = _file_stamp(template_abs)
+    with _cache_lock:
+        entry = _template_cache.get(template_abs)
+        if entry is None or entry[0] != stamp:
+            entry = (stamp, CompiledTemplate.load(template_abs), threading.Lock())
+            _template_cache[template_abs] = entry
+        return entry[1], entry[2]
+
+
+def render(profile_name: str | None, values: dict) -> bytes:
+    # values — значения полей по внутренним именам: {"NAME": "...", "FLAG": True}
+    cfg = _cached_config()
+    profile_name = profile_name or cfg["current_profile"]
+    profile = cfg["profiles"].get(profile_name)
+    if profile is None:
+        raise KeyError(f"Шаблон полей не найден: {profile_name}")
+
+    fields = profile["fields"]
+    values = coerce_values(fields, values)
+    out = io.BytesIO()
+    tmpl_abs = template_abs_path(profile.get("template_path"))
+    if tmpl_abs and os.path.exists(tmpl_abs):
+        template, lock = _cached_template(tmpl_abs)
+        with lock:
+            template.save_rendered(build_placeholders(fields, values), out)
+    else:
+        build_plain_report(fields, values).save(out)
+    return out.getvalue()
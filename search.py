@@ -0,0 +1,132 @@
+import bisect
+import heapq
+import queue
+import re
+import threading
+from array import array
+
+WORD_RE = re.compile(r"\w+")
+
+MIN_PREFIX = 2
+MAX_HITS = 50_000
+
+
+# Обратный индекс документа: слово (в нижнем регистре) -> смещения его
+# вхождений. Одно слово в запросе ищется как префикс, фраза — по первому
+# слову с проверкой остальных прямо по тексту.
+class SearchIndex:
+    def __init__(self, text: str, words: dict):
+        self.text = text
+        self.words = words
+        self.vocab = sorted(words)
+
+    @classmethod
+    def build(cls, text: str, cancel_event=None) -> "SearchIndex | None":
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # редкие символы меняют длину при смене регистра — тогда
+            # смещения считаем по исходному тексту
+            lowered = None
+
+        words = {}
+        for i, m in enumerate(WORD_RE.finditer(lowered if lowered is not None else text)):
+            word = m.group() if lowered is not None else m.group().lower()
+            offsets = words.get(word)
+            if offsets is None:
+                offsets = words[word] = array("q")
+            offsets.append(m.start())
+            if i % 100_000 == 0 and cancel_event is not None and cancel_event.is_set():
+                return None
+        return cls(text, words)
+
+    def _prefix_offsets(self, prefix: str):
+        i = bisect.bisect_left(self.vocab, prefix)
+        found = []
+        while i < len(self.vocab) and self.vocab[i].startswith(prefix):
+            found.append(self.words[self.vocab[i]])
+            i += 1
+        if len(found) == 1:
+            return found[0]
+        return heapq.merge(*found)
+
+    def find(self, query: str) -> list[tuple[int, int]]:
+        terms = WORD_RE.findall(query.lower())
+        if not terms:
+            return []
+
+        if len(terms) == 1:
+            term = terms[0]
+            if len(term) < MIN_PREFIX:
+                return []
+            hits = []
+            for offset in self._prefix_offsets(term):
+                hits.append((offset, offset + len(term)))
+                if len(hits) >= MAX_HITS:
+                    break
+            return hits
+
+        # фраза: слова через любые разделители, последнее — как префикс
+        pattern = re.compile(
+            r"\W+".join(re.escape(t) for t in terms[:-1]) + r"\W+" + re.escape(terms[-1]),
+            re.IGNORECASE,
+        )
+        hits = []
+        for offset in self.words.get(terms[0], ()):
+            m = pattern.match(self.text, offset)
+            if m:
+                hits.append((offset, m.end()))
+                if len(hits) >= MAX_HITS:
+                    break
+        return hits
+
+
+# Строит индекс в фоновом потоке; готовый индекс передаётся в Tk через after().
+# Индекс для документа, который уже закрыли, отбрасывается.
+class IndexBuilder:
+    POLL_MS = 100
+
+    def __init__(self, widget, on_ready):
+        self.widget = widget
+        self.on_ready = on_ready
+        self._queue = queue.Queue()
+        self._generation = 0
+        self._cancel_event = None
+        self._polling = False
+
+    def build(self, text: str):
+        self.cancel()
+        self._generation += 1
+        self._cancel_event = threading.Event()
+        threading.Thread(
+            target=self._work,
+            args=(self._generation, text, self._cancel_event),
+            daemon=True,
+        ).start()
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.POLL_MS, self._poll)
+
+    def cancel(self):
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+            self._cancel_event = None
+        self._generation += 1
+
+    def _work(self, generation, text, cancel_event):
+        index = SearchIndex.build(text, cancel_event)
+        if index is not None:
+            self._queue.put((generation, index))
+
+    def _poll(self):
+        while True:
+            try:
+                generation, index = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self._generation:
+                self._cancel_event = None
+                self.on_ready(index)
+        if self._cancel_event is not None:
+            self.widget.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
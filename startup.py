@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+
+from config import SETTINGS, STORAGE_DIR, log
+
+STARTUP_LOG = os.path.join(STORAGE_DIR, "startup.log")
+STARTUP_LOG_LINES = 200
+
+# запасной вариант, если время запуска процесса узнать не удалось
+_IMPORT_TIME = time.time()
+
+
+def process_age() -> float:
+    # сколько секунд прошло с запуска процесса: включает загрузку
+    # интерпретатора и распаковку main.exe, которых не видно изнутри программы
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            creation = wintypes.FILETIME()
+            dummy = [wintypes.FILETIME() for _ in range(3)]
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            ok = ctypes.windll.kernel32.GetProcessTimes(
+                handle, ctypes.byref(creation), *(ctypes.byref(d) for d in dummy)
+            )
+            if ok:
+                ticks = (creation.dwHighDateTime << 32) | creation.dwLowDateTime
+                # FILETIME — интервалы по 100 нс от 1601-01-01
+                return time.time() - (ticks / 10_000_000 - 11644473600)
+        elif sys.platform.startswith("linux"):
+            with open("/proc/self/stat", "r") as f:
+                # имя процесса в скобках может содержать пробелы
+                fields = f.read().rsplit(")", 1)[1].split()
+            # запуск — в тиках от загрузки системы; btime из /proc/stat
+            # округлён до секунды, поэтому считаем от часов с момента загрузки
+            started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+            return time.clock_gettime(time.CLOCK_BOOTTIME) - started
+    except Exception:
+        pass
+    return time.time() - _IMPORT_TIME
+
+
+def record_startup(seconds: float):
+    budget_ms = int(SETTINGS.get("startup_budget_ms") or 0)
+    ms = seconds * 1000
+    line = f"{time.strftime('%Y-%m-%d %H:%M:%S')}\t{ms:.0f} ms"
+    if budget_ms and ms > budget_ms:
+        line += f"\tпревышен бюджет {budget_ms} ms"
+
+    log.info("Запуск: %.0f мс", ms)
+
+    try:
+        lines = []
+        if os.path.exists(STARTUP_LOG):
+            with open(STARTUP_LOG, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        lines = lines[-(STARTUP_LOG_LINES - 1):] + [line]
+        with open(STARTUP_LOG, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    except OSError:
+        pass
+
+
+def measure_first_frame(window):
+    # замер до первой отрисовки окна: <Map> приходит, когда окно показано,
+    # after_idle — когда Tk закончил отрисовку содержимого
+    if not SETTINGS.get("startup_log"):
+        return
+
+    def on_map(event):
+        if event.widget is not window:
+            return
+        window.unbind("<Map>", bind_id)
+        window.after_idle(lambda: record_startup(process_age()))
+
+    bind_id = window.bind("<Map>", on_map, add="+")
@@ -0,0 +1,81 @@
+import os
+import sys
+import tkinter as tk
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytestmark = pytest.mark.skipif(
+    sys.platform.startswith("linux") and not os.environ.get("DISPLAY"),
+    reason="нужен дисплей для Tk",
+)
+
+
+def _menus(widget) -> int:
+    count = 1 if isinstance(widget, tk.Menu) else 0
+    for child in widget.winfo_children():
+        count += _menus(child)
+    return count
+
+
+def _tcl_commands(app) -> int:
+    # команды Tcl, кроме самих виджетов (их имена начинаются с точки):
+    # меню, привязки и трассировки, вызывающие Python
+    names = app.tk.splitlist(app.tk.call("info", "commands"))
+    return sum(1 for name in names if not name.startswith("."))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    import config
+    import main
+    from archive import ReportArchive
+    from history import ValueHistory
+    from journal import DraftJournal
+
+    # ничего не читается из storage/ и не пишется туда
+    monkeypatch.setattr(main, "load_config", config.default_config)
+    monkeypatch.setattr(main, "DraftJournal", lambda: DraftJournal(str(tmp_path / "drafts.journal")))
+    monkeypatch.setattr(main, "ValueHistory", lambda: ValueHistory(str(tmp_path / "history.sqlite3")))
+    monkeypatch.setattr(main, "ReportArchive", lambda: ReportArchive(str(tmp_path / "archive.sqlite3")))
+    monkeypatch.setattr(main, "measure_first_frame", lambda window: None)
+    monkeypatch.setattr(main.FileFormApp, "_offer_draft_restore", lambda self: None)
+
+    app = main.FileFormApp()
+    app.update()
+    yield app
+    app.destroy()
+
+
+def _build(app, count: int, generation: int):
+    # новые имена — все строки формы пересоздаются; типы чередуются,
+    # чтобы были и однострочные, и многострочные поля, и флажки
+    app.fields[:] = [
+        {"name": f"f{generation}_{i}", "label": f"Поле {i}", "type": ("text", "multiline", "checkbox")[i % 3]}
+        for i in range(count)
+    ]
+    app.build_form()
+    # создаём виджеты всех строк, а не только видимых
+    panel = app.form_panels[app.current_profile]
+    for row in panel.order:
+        if not row.realized:
+            row.realize(panel)
+            row.frame.place(x=0, y=row.top, relwidth=1)
+    app.update()
+    assert all(row.realized for row in panel.order)
+
+
+def test_menu_and_tcl_counts_do_not_grow_with_fields_or_rebuilds(app):
+    _build(app, 10, 0)
+    menus = _menus(app)
+    commands = _tcl_commands(app)
+
+    _build(app, 60, 1)
+    assert _menus(app) == menus
+    assert _tcl_commands(app) == commands
+
+    for generation in range(2, 5):
+        _build(app, 60, generation)
+        assert _menus(app) == menus
+        assert _tcl_commands(app) == commands
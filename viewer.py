@@ -0,0 +1,380 @@
+import bisect
+import tkinter as tk
+from tkinter import ttk
+from array import array
+from itertools import accumulate
+
+from config import SETTINGS
+
+
+# Текст документа, хранящийся кусками в том виде, как он пришёл от читалки,
+# плюс массив смещений начала каждой строки — без списка из миллиона строк.
+class TextStore:
+    def __init__(self):
+        self._blocks = []
+        self._block_starts = array("q")
+        self._line_starts = array("q", [0])
+        self.length = 0
+
+    def append(self, text: str):
+        if not text:
+            return
+        base = self.length
+        self._blocks.append(text)
+        self._block_starts.append(base)
+
+        parts = text.split("\n")
+        if len(parts) > 1:
+            # начало строки k = base + сумма длин предыдущих частей + k переводов строки
+            lengths = map((1).__add__, map(len, parts[:-1]))
+            starts = accumulate(lengths, initial=base)
+            next(starts)
+            self._line_starts.extend(starts)
+        self.length += len(text)
+
+    @property
+    def line_count(self) -> int:
+        return len(self._line_starts)
+
+    def line_start(self, line: int) -> int:
+        return self._line_starts[line]
+
+    def line_of(self, offset: int) -> int:
+        return bisect.bisect_right(self._line_starts, offset) - 1
+
+    def slice(self, start: int, stop: int) -> str:
+        start = max(0, start)
+        stop = min(self.length, stop)
+        if start >= stop:
+            return ""
+        i = bisect.bisect_right(self._block_starts, start) - 1
+        pieces = []
+        while i < len(self._blocks) and self._block_starts[i] < stop:
+            block_start = self._block_starts[i]
+            block = self._blocks[i]
+            pieces.append(block[max(0, start - block_start):stop - block_start])
+            i += 1
+        return "".join(pieces)
+
+    def lines_text(self, first: int, last: int) -> str:
+        # строки [first, last) без завершающего перевода строки
+        start = self._line_starts[first]
+        stop = self._line_starts[last] - 1 if last < self.line_count else self.length
+        return self.slice(start, stop)
+
+    def text(self) -> str:
+        return self.slice(0, self.length)
+
+
+# Левая панель просмотра. Небольшие документы целиком лежат в tk.Text;
+# когда текст перерастает порог, он переезжает в TextStore, а в виджете
+# остаётся только видимый кусок с запасом строк сверху и снизу.
+# В оконном режиме панель только для чтения.
+class DocumentView:
+    MARGIN_LINES = 500
+    VISIBLE_LINES = 100
+
+    def __init__(self, parent, threshold_chars: int | None = None):
+        if threshold_chars is None:
+            threshold_chars = int(SETTINGS.get("viewer_window_threshold_chars") or 0)
+        self.threshold_chars = threshold_chars
+
+        self.text = tk.Text(parent, wrap="word")
+        self.scroll = ttk.Scrollbar(parent, command=self._on_scrollbar)
+        self.text.configure(yscrollcommand=self._on_text_yscroll)
+
+        self.text.pack(side="left", fill="both", expand=True)
+        self.scroll.pack(side="right", fill="y")
+
+        self.text.bind("<ButtonPress-1>", self._on_button_press, add="+")
+        self.text.bind("<ButtonRelease-1>", self._on_button_release, add="+")
+        self.text.bind("<KeyRelease>", lambda e: self._sync_selection(), add="+")
+        self.text.bind("<<Modified>>", self._on_modified, add="+")
+
+        self.store = None
+        self._size = 0
+        self.win_start = 0
+        self.win_end = 0
+        self._selection = None
+        self._dragging = False
+        self._pending_top = None
+        # разметка строк для обычного режима — строится по требованию
+        self._plain_store = None
+        # подсветки в координатах документа: тег -> (начала, концы)
+        self._highlights = {}
+        # вызывается при правке текста пользователем (вставка в обычном режиме)
+        self.on_modified = None
+
+    @property
+    def windowed(self) -> bool:
+        return self.store is not None
+
+    def clear(self):
+        self.store = None
+        self._size = 0
+        self.win_start = self.win_end = 0
+        self._selection = None
+        self._pending_top = None
+        self._plain_store = None
+        self._highlights.clear()
+        self.text.config(state="normal")
+        self.text.delete("1.0", tk.END)
+        self.text.edit_modified(False)
+
+    def append(self, chunk: str):
+        if self.store is None:
+            self._size += len(chunk)
+            if not self.threshold_chars or self._size <= self.threshold_chars:
+                self.text.insert(tk.END, chunk)
+                self.text.edit_modified(False)
+                self._plain_store = None
+                return
+            self._switch_to_window()
+
+        self.store.append(chunk)
+        if self.win_end - self.win_start < self.VISIBLE_LINES + 2 * self.MARGIN_LINES:
+            # окно ещё не заполнено — докладываем новые строки
+            self._materialize(self._top_line())
+        else:
+            self._update_scrollbar()
+
+    def get_text(self) -> str:
+        if self.store is not None:
+            return self.store.text()
+        return self.text.get("1.0", "end-1c")
+
+    def get_selection(self) -> str | None:
+        if self.store is None:
+            try:
+                return self.text.get("sel.first", "sel.last")
+            except tk.TclError:
+                return None
+        self._sync_selection()
+        if self._selection is None:
+            return None
+        return self.store.slice(*self._selection)
+
+    def select_all(self):
+        if self.store is None:
+            self.text.tag_add("sel", "1.0", "end-1c")
+            return
+        self._selection = (0, self.store.length)
+        self._apply_selection()
+
+    def _on_modified(self, event=None):
+        if not self.text.edit_modified():
+            return
+        self.text.edit_modified(False)
+        if self.store is None:
+            self._plain_store = None
+            if self.on_modified is not None:
+                self.on_modified()
+
+    # --- подсветка и переход по смещениям в документе ---
+
+    def _line_store(self) -> TextStore:
+        if self.store is not None:
+            return self.store
+        if self._plain_store is None:
+            self._plain_store = TextStore()
+            self._plain_store.append(self.text.get("1.0", "end-1c"))
+        return self._plain_store
+
+    def index_of(self, offset: int) -> str:
+        store = self._line_store()
+        line = store.line_of(offset)
+        return f"{line - self.win_start + 1}.{offset - store.line_start(line)}"
+
+    def see_offset(self, offset: int):
+        if self.store is not None:
+            win_first, win_last = self._window_offsets()
+            if not win_first <= offset <= win_last:
+                self._materialize(self.store.line_of(offset) - self.VISIBLE_LINES // 2)
+        index = self.index_of(offset)
+        self.text.see(index)
+        self.text.mark_set(tk.INSERT, index)
+
+    def set_highlights(self, tag: str, ranges: list[tuple[int, int]]):
+        # пересекающиеся диапазоны сливаются: поиск видимых в оконном
+        # режиме идёт бисекцией и по началам, и по концам
+        starts = array("q")
+        ends = array("q")
+        for a, b in sorted(ranges):
+            if ends and a <= ends[-1]:
+                ends[-1] = max(ends[-1], b)
+            else:
+                starts.append(a)
+                ends.append(b)
+        self._highlights[tag] = (starts, ends)
+        self._apply_highlights(tag)
+        self.text.tag_raise("sel")
+
+    def clear_highlights(self, tag: str):
+        self._highlights.pop(tag, None)
+        self.text.tag_remove(tag, "1.0", tk.END)
+
+    def _apply_highlights(self, tag: str):
+        self.text.tag_remove(tag, "1.0", tk.END)
+        starts, ends = self._highlights[tag]
+        if self.store is not None:
+            first, last = self._window_offsets()
+            i = bisect.bisect_left(ends, first)
+            j = bisect.bisect_right(starts, last)
+        else:
+            first, last = 0, self._line_store().length
+            i, j = 0, len(starts)
+
+        # tag add принимает сразу много пар индексов — отдаём пачками
+        batch = []
+        for k in range(i, j):
+            batch.append(self.index_of(max(starts[k], first)))
+            batch.append(self.index_of(min(ends[k], last)))
+            if len(batch) >= 2000:
+                self.text.tag_add(tag, *batch)
+                batch = []
+        if batch:
+            self.text.tag_add(tag, *batch)
+
+    def _switch_to_window(self):
+        top = int(self.text.index("@0,0").split(".")[0]) - 1
+        self.store = TextStore()
+        self.store.append(self.text.get("1.0", "end-1c"))
+        self._plain_store = None
+        self.text.config(state="disabled")
+        self._materialize(top)
+
+    # --- пересчёт позиций между окном и всем документом ---
+
+    def _to_offset(self, index: str) -> int:
+        line, col = self.text.index(index).split(".")
+        return self.store.line_start(self.win_start + int(line) - 1) + int(col)
+
+    def _to_index(self, offset: int) -> str:
+        line = self.store.line_of(offset)
+        col = offset - self.store.line_start(line)
+        return f"{line - self.win_start + 1}.{col}"
+
+    def _window_offsets(self) -> tuple[int, int]:
+        start = self.store.line_start(self.win_start)
+        if self.win_end < self.store.line_count:
+            stop = self.store.line_start(self.win_end) - 1
+        else:
+            stop = self.store.length
+        return start, stop
+
+    def _top_line(self) -> int:
+        if self.store is None or self.win_end == self.win_start:
+            return 0
+        return self.win_start + int(self.text.index("@0,0").split(".")[0]) - 1
+
+    def _bottom_line(self) -> int:
+        height = self.text.winfo_height()
+        return self.win_start + int(self.text.index(f"@0,{height}").split(".")[0])
+
+    # --- выделение: хранится в координатах всего документа ---
+
+    def _sync_selection(self):
+        if self.store is None:
+            return
+        try:
+            first = self._to_offset("sel.first")
+            last = self._to_offset("sel.last")
+        except tk.TclError:
+            # выделение может быть целиком за пределами окна — не трогаем его
+            return
+
+        # если прежнее выделение выходило за окно, а в окне оно упирается
+        # в край, значит оно продолжается за пределами окна
+        win_first, win_last = self._window_offsets()
+        if self._selection is not None:
+            old_first, old_last = self._selection
+            if first == win_first and old_first < win_first:
+                first = old_first
+            if last == win_last and old_last > win_last:
+                last = old_last
+        self._selection = (first, last)
+
+    def _apply_selection(self):
+        self.text.tag_remove("sel", "1.0", tk.END)
+        if self._selection is None:
+            return
+        win_first, win_last = self._window_offsets()
+        first = max(self._selection[0], win_first)
+        last = min(self._selection[1], win_last)
+        if first < last:
+            self.text.tag_add("sel", self._to_index(first), self._to_index(last))
+
+    def _on_button_press(self, event):
+        self._dragging = True
+
+    def _on_button_release(self, event):
+        self._dragging = False
+        if self.store is None:
+            return
+        # обычный щелчок сбрасывает выделение и за пределами окна
+        if not self.text.tag_ranges("sel"):
+            self._selection = None
+        else:
+            self._sync_selection()
+        self._materialize_pending()
+
+    # --- прокрутка ---
+
+    def _materialize(self, top: int):
+        self._pending_top = None
+        self._sync_selection()
+
+        total = self.store.line_count
+        top = max(0, min(top, total - 1))
+        start = max(0, top - self.MARGIN_LINES)
+        end = min(total, top + self.VISIBLE_LINES + self.MARGIN_LINES)
+
+        self.text.config(state="normal")
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", self.store.lines_text(start, end))
+        self.text.config(state="disabled")
+        self.win_start, self.win_end = start, end
+
+        self._apply_selection()
+        for tag in self._highlights:
+            self._apply_highlights(tag)
+        self.text.yview(f"{top - start + 1}.0")
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = max(self.store.line_count, 1)
+        top = self._top_line()
+        bottom = min(self._bottom_line(), total)
+        self.scroll.set(top / total, bottom / total)
+
+    def _on_text_yscroll(self, first, last):
+        if self.store is None:
+            self.scroll.set(first, last)
+            return
+
+        top = self._top_line()
+        bottom = self._bottom_line()
+        near_top = self.win_start > 0 and top - self.win_start < self.MARGIN_LINES // 4
+        near_bottom = (
+            self.win_end < self.store.line_count
+            and self.win_end - bottom < self.MARGIN_LINES // 4
+        )
+        if (near_top or near_bottom) and self._pending_top is None:
+            self._pending_top = top
+            # во время протягивания выделения окно не перестраиваем
+            if not self._dragging:
+                self.text.after_idle(self._materialize_pending)
+        self._update_scrollbar()
+
+    def _materialize_pending(self):
+        if self._pending_top is not None and not self._dragging:
+            self._materialize(self._top_line())
+
+    def _on_scrollbar(self, *args):
+        if self.store is None:
+            self.text.yview(*args)
+            return
+        if args[0] == "moveto":
+            self._materialize(int(float(args[1]) * self.store.line_count))
+        else:
+            self.text.yview(*args)